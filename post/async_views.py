@@ -0,0 +1,37 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404
+
+from post.cache import post_detail_cache
+from post.models import Post
+from post.views import PostViewSet, LikedPosts
+from social_media_api.async_views import AsyncListView, AsyncRetrieveView
+
+
+class AsyncPostList(AsyncListView):
+    view_class = PostViewSet
+
+
+class AsyncPostDetail(AsyncRetrieveView):
+    view_class = PostViewSet
+
+    async def get_data(self, view):
+        queryset = await self.get_queryset(view)
+        try:
+            post_id = await (
+                queryset.prefetch_related(None)
+                .values_list("pk", flat=True)
+                .aget(pk=view.kwargs["pk"])
+            )
+        except Post.DoesNotExist:
+            raise Http404
+
+        def build():
+            return view.get_serializer(view.get_object()).data
+
+        return await sync_to_async(post_detail_cache.get_or_build)(
+            post_id, view.get_detail_cache_variant(), build
+        )
+
+
+class AsyncLikedPosts(AsyncListView):
+    view_class = LikedPosts
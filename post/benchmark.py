@@ -0,0 +1,42 @@
+import math
+
+from django.conf import settings
+
+
+def request_host():
+    """Return a host name accepted by ALLOWED_HOSTS for in-process requests"""
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*":
+            return host.lstrip(".")
+    return "localhost"
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[max(0, math.ceil(len(sorted_values) * fraction) - 1)]
+
+
+def summarize(latencies, errors, elapsed):
+    """Return throughput and latency percentiles of a benchmark run"""
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def format_table(rows, columns):
+    widths = [
+        max(len(column), *(len(str(row[column])) for row in rows)) for column in columns
+    ]
+    lines = ["  ".join(column.rjust(width) for column, width in zip(columns, widths))]
+    for row in rows:
+        lines.append(
+            "  ".join(
+                str(row[column]).rjust(width) for column, width in zip(columns, widths)
+            )
+        )
+    return "\n".join(lines)
@@ -0,0 +1,163 @@
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+
+from post.models import Post, Like, Comment
+from post.timeline import rebuild_timelines
+
+
+def execute_schema_change(change):
+    # The SQLite schema editor verifies all foreign keys on exit, including
+    # forward references of rows that are not imported yet, so statements are
+    # collected and executed directly.
+    editor = connection.schema_editor(collect_sql=True)
+    change(editor)
+    with connection.cursor() as cursor:
+        for sql in editor.collected_sql:
+            cursor.execute(sql)
+
+
+class BulkImporter:
+    """
+    Batched insertion of model instances and their many-to-many links.
+
+    Rows are inserted with `bulk_create`, so no signals are sent, and as with
+    `loaddata` the given values of auto_now(_add) fields are kept. Foreign keys
+    are only verified at the end, and secondary indexes of imported models are
+    dropped until then unless `keep_indexes` is set. Denormalized counters and
+    home timelines are rebuilt afterwards.
+    """
+
+    def __init__(
+        self,
+        stdout,
+        batch_size=5000,
+        keep_indexes=False,
+        skip_timelines=False,
+        verbosity=1,
+    ):
+        self.stdout = stdout
+        self.batch_size = batch_size
+        self.keep_indexes = keep_indexes
+        self.skip_timelines = skip_timelines
+        self.verbosity = verbosity
+        self.pending = {}
+        self.imported = {}
+        self.dropped_indexes = []
+        self.auto_now_fields = []
+        self.started = self.reported = time.perf_counter()
+
+    @contextmanager
+    def importing(self):
+        # SQLite only allows disabling foreign key checks outside transactions.
+        try:
+            with connection.constraint_checks_disabled(), transaction.atomic():
+                yield self
+
+                for model in list(self.pending):
+                    self.flush(model)
+                imported_models = list(self.imported)
+                connection.check_constraints(
+                    table_names=[model._meta.db_table for model in imported_models]
+                )
+                self.finish(imported_models)
+        finally:
+            for field, auto_now, auto_now_add in self.auto_now_fields:
+                field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+    def add(self, obj, m2m_data=None):
+        model = type(obj)
+        if model not in self.pending:
+            self.pending[model] = []
+            self.drop_indexes(model)
+            self.keep_auto_now_values(model)
+
+        self.pending[model].append((obj, m2m_data or {}))
+        if len(self.pending[model]) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model):
+        rows, self.pending[model] = self.pending[model], []
+        if not rows:
+            return
+
+        model.objects.bulk_create([obj for obj, _ in rows], batch_size=self.batch_size)
+        self.record(model, len(rows))
+
+        for field_name in {name for _, m2m_data in rows for name in m2m_data}:
+            field = model._meta.get_field(field_name)
+            through = field.remote_field.through
+            source = through._meta.get_field(field.m2m_field_name()).attname
+            target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+            links = [
+                through(**{source: obj.pk, target: related_pk})
+                for obj, m2m_data in rows
+                for related_pk in m2m_data.get(field_name, ())
+            ]
+            through.objects.bulk_create(links, batch_size=self.batch_size)
+            self.record(through, len(links))
+
+    def record(self, model, rows):
+        self.imported[model] = self.imported.get(model, 0) + rows
+
+        now = time.perf_counter()
+        if self.verbosity > 1 or now - self.reported >= 10:
+            self.reported = now
+            rate = self.total / (now - self.started)
+            self.stdout.write(f"{self.total} row(s) imported, {rate:.0f} rows/s")
+
+    @property
+    def total(self):
+        return sum(self.imported.values())
+
+    def keep_auto_now_values(self, model):
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.DateField) and (
+                field.auto_now or field.auto_now_add
+            ):
+                self.auto_now_fields.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+
+    def drop_indexes(self, model):
+        if self.keep_indexes or not model._meta.indexes:
+            return
+
+        for index in model._meta.indexes:
+            execute_schema_change(lambda editor: editor.remove_index(model, index))
+            self.dropped_indexes.append((model, index))
+
+    def finish(self, imported_models):
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(), imported_models)
+        with connection.cursor() as cursor:
+            for sql in sequence_sql:
+                cursor.execute(sql)
+
+        User = get_user_model()
+        if {Post, Like, Comment} & set(imported_models):
+            call_command("rebuild_post_counters", stdout=self.stdout)
+        if {User, User.following.through} & set(imported_models):
+            call_command("rebuild_follow_counters", stdout=self.stdout)
+        if not self.skip_timelines and {
+            Post,
+            User.following.through,
+        } & set(imported_models):
+            self.stdout.write("Rebuilding home timelines")
+            rebuild_timelines()
+
+        for model, index in self.dropped_indexes:
+            execute_schema_change(lambda editor: editor.add_index(model, index))
+
+    def report(self, style):
+        elapsed = time.perf_counter() - self.started
+        for model, count in self.imported.items():
+            self.stdout.write(f"{model._meta.label}: {count} row(s)")
+        self.stdout.write(
+            style.SUCCESS(
+                f"Imported {self.total} row(s) in {elapsed:.1f}s "
+                f"({self.total / max(elapsed, 1e-9):.0f} rows/s)"
+            )
+        )
@@ -0,0 +1,74 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from social_media_api.metrics import CACHE_LOOKUPS
+from social_media_api.routers import use_primary
+
+
+class PostDetailCache:
+    """
+    Read-through cache of serialized post details.
+
+    Entries are keyed by post id and a version stamp, so invalidating a post
+    only needs to replace its stamp. A miss is rebuilt by a single caller
+    holding a short-lived lock while concurrent callers wait for its result.
+    Entries are built from the primary database, as a lagging replica could
+    otherwise cache stale content under the current version stamp.
+    """
+
+    prefix = "post-detail"
+    poll_interval = 0.01
+
+    def _version_key(self, post_id):
+        return f"{self.prefix}:version:{post_id}"
+
+    def _version(self, post_id):
+        key = self._version_key(post_id)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, time.time_ns(), None)
+            version = cache.get(key)
+        return version
+
+    def _bump(self, post_id):
+        cache.set(self._version_key(post_id), time.time_ns(), None)
+
+    def invalidate(self, post_id):
+        self._bump(post_id)
+        # A rebuild may have read the data before the change was committed.
+        transaction.on_commit(lambda: self._bump(post_id))
+
+    def get_or_build(self, post_id, variant, build):
+        key = f"{self.prefix}:{post_id}:{self._version(post_id)}:{variant}"
+        data = cache.get(key)
+        if data is not None:
+            CACHE_LOOKUPS.labels("post-detail", "hit").inc()
+            return data
+
+        CACHE_LOOKUPS.labels("post-detail", "miss").inc()
+        lock_key = f"{key}:lock"
+        lock_timeout = settings.POST_DETAIL_CACHE_LOCK_TIMEOUT
+        deadline = time.monotonic() + lock_timeout
+        while not cache.add(lock_key, True, lock_timeout):
+            if time.monotonic() >= deadline:
+                with use_primary():
+                    return build()
+            time.sleep(self.poll_interval)
+            data = cache.get(key)
+            if data is not None:
+                return data
+
+        try:
+            with use_primary():
+                data = build()
+            cache.set(key, data, settings.POST_DETAIL_CACHE_TIMEOUT)
+        finally:
+            cache.delete(lock_key)
+
+        return data
+
+
+post_detail_cache = PostDetailCache()
@@ -0,0 +1,75 @@
+import zlib
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core import serializers
+from django.db.models import Max
+
+from post.models import Tag, Post, Comment, Like
+
+
+def export_querysets():
+    return [
+        Tag.objects.all(),
+        Post.objects.prefetch_related("tags"),
+        Comment.objects.all(),
+        Like.objects.all(),
+        get_user_model().following.through.objects.all(),
+    ]
+
+
+def current_watermark():
+    """Return the last exportable primary key of each model"""
+    return {
+        queryset.model._meta.label_lower: queryset.aggregate(last=Max("pk"))["last"]
+        or 0
+        for queryset in export_querysets()
+    }
+
+
+def parse_watermark(token):
+    labels = {queryset.model._meta.label_lower for queryset in export_querysets()}
+    watermark = {}
+    for item in filter(None, token.split(",")):
+        label, _, pk = item.partition(":")
+        if label not in labels:
+            raise ValueError(f"Unknown model {label!r} in watermark")
+        try:
+            watermark[label] = int(pk)
+        except ValueError:
+            raise ValueError(f"Invalid primary key {pk!r} in watermark")
+    return watermark
+
+
+def format_watermark(watermark):
+    return ",".join(f"{label}:{pk}" for label, pk in watermark.items())
+
+
+def export_ndjson(since=None, until=None, chunk_size=2000):
+    """
+    Yield exported rows as NDJSON in fixture format, a chunk at a time.
+
+    Only rows with a primary key above `since` and up to `until` are exported,
+    both map model labels to primary keys as returned by `current_watermark`.
+    Rows are read with server-side cursors where the database supports them,
+    so memory use does not depend on table size.
+    """
+    serializer = serializers.get_serializer("jsonl")()
+    for queryset in export_querysets():
+        label = queryset.model._meta.label_lower
+        queryset = queryset.filter(pk__gt=(since or {}).get(label, 0))
+        if until is not None:
+            queryset = queryset.filter(pk__lte=until[label])
+
+        rows = queryset.order_by("pk").iterator(chunk_size=chunk_size)
+        while chunk := list(islice(rows, chunk_size)):
+            yield serializer.serialize(chunk)
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,193 @@
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction, close_old_connections
+from django.db.models import F
+
+from post.cache import post_detail_cache
+from post.models import Post, Like
+
+logger = logging.getLogger(__name__)
+
+
+class LikeBuffer:
+    """
+    Write-behind buffer of like/unlike intents.
+
+    Intents are coalesced per (user, post) pair as `[stored, wanted]` states
+    and written to the database in bulk by `flush`, which runs in a
+    background thread every `LIKE_WRITE_BEHIND_INTERVAL` seconds. The like
+    count change of each post's pending intents is kept alongside them, and
+    intents being flushed stay visible until their write has committed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._deltas = {}
+        self._in_flight = {}
+        self._in_flight_deltas = {}
+        self._flusher = None
+
+    def _update(self, user_id, post_id, wanted):
+        key = (user_id, post_id)
+        stored = None
+        while True:
+            with self._lock:
+                entry = self._pending.get(key)
+                if entry is None and stored is not None:
+                    entry = self._pending[key] = [stored, stored]
+                if entry is not None:
+                    liked = wanted(entry[1])
+                    self._add_delta(post_id, liked - entry[1])
+                    entry[1] = liked
+                    break
+                in_flight = self._in_flight.get(key)
+            if in_flight is not None:
+                stored = in_flight
+            else:
+                stored = Like.objects.filter(user_id=user_id, post_id=post_id).exists()
+
+        post_detail_cache.invalidate(post_id)
+        self._ensure_flusher()
+        return liked
+
+    def toggle(self, user_id, post_id):
+        """Toggle like of the post and return whether it is liked now"""
+        return self._update(user_id, post_id, lambda liked: not liked)
+
+    def set_liked(self, user_id, post_id, liked):
+        self._update(user_id, post_id, lambda _: liked)
+
+    def pending_delta(self, post_id):
+        return self._deltas.get(post_id, 0) + self._in_flight_deltas.get(post_id, 0)
+
+    def _add_delta(self, post_id, delta):
+        delta += self._deltas.get(post_id, 0)
+        if delta:
+            self._deltas[post_id] = delta
+        else:
+            self._deltas.pop(post_id, None)
+
+    def pending_for_user(self, user_id):
+        """Return ids of posts pending to be liked and unliked by the user"""
+        liked, unliked = set(), set()
+        if not self._pending and not self._in_flight:
+            return liked, unliked
+        with self._lock:
+            states = {
+                post_id: wanted
+                for (pending_user_id, post_id), wanted in self._in_flight.items()
+                if pending_user_id == user_id
+            }
+            for (pending_user_id, post_id), (stored, wanted) in self._pending.items():
+                if pending_user_id == user_id and stored != wanted:
+                    states[post_id] = wanted
+        for post_id, wanted in states.items():
+            (liked if wanted else unliked).add(post_id)
+        return liked, unliked
+
+    def clear(self):
+        with self._lock:
+            self._pending = {}
+            self._deltas = {}
+
+    def flush(self):
+        """Write pending intents to the database and return how many changed"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            deltas, self._deltas = self._deltas, {}
+            changes = {
+                key: wanted
+                for key, (stored, wanted) in pending.items()
+                if stored != wanted
+            }
+            self._in_flight = changes
+            self._in_flight_deltas = deltas
+        if not changes:
+            return 0
+
+        try:
+            self._write(changes)
+        except Exception:
+            logger.exception("Failed to flush %d buffered likes", len(changes))
+            with self._lock:
+                for key, entry in pending.items():
+                    if key not in self._pending:
+                        self._pending[key] = entry
+                        self._add_delta(key[1], entry[1] - entry[0])
+            return 0
+        finally:
+            with self._lock:
+                self._in_flight = {}
+                self._in_flight_deltas = {}
+
+        return len(changes)
+
+    def _write(self, changes):
+        posts_to_like = defaultdict(set)
+        posts_to_unlike = defaultdict(set)
+        for (user_id, post_id), liked in changes.items():
+            (posts_to_like if liked else posts_to_unlike)[post_id].add(user_id)
+
+        user_ids = {user_id for user_id, _ in changes}
+        user_ids = set(
+            get_user_model()
+            .objects.filter(pk__in=user_ids)
+            .values_list("pk", flat=True)
+        )
+
+        with transaction.atomic():
+            post_ids = Post.objects.filter(
+                pk__in={post_id for _, post_id in changes}
+            ).values_list("pk", flat=True)
+
+            for post_id in post_ids:
+                if posts_to_unlike[post_id]:
+                    Like.objects.filter(
+                        post_id=post_id, user_id__in=posts_to_unlike[post_id]
+                    ).delete()
+
+                new_user_ids = (posts_to_like[post_id] & user_ids) - set(
+                    Like.objects.filter(
+                        post_id=post_id, user_id__in=posts_to_like[post_id]
+                    ).values_list("user_id", flat=True)
+                )
+                if new_user_ids:
+                    Like.objects.bulk_create(
+                        [
+                            Like(user_id=user_id, post_id=post_id)
+                            for user_id in new_user_ids
+                        ]
+                    )
+                    Post.objects.filter(pk=post_id).update(
+                        like_count=F("like_count") + len(new_user_ids)
+                    )
+                    post_detail_cache.invalidate(post_id)
+
+    def _ensure_flusher(self):
+        interval = settings.LIKE_WRITE_BEHIND_INTERVAL
+        if not interval or self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(
+                target=self._flush_forever, args=(interval,), daemon=True
+            )
+            self._flusher.start()
+        atexit.register(self.flush)
+
+    def _flush_forever(self, interval):
+        while True:
+            time.sleep(interval)
+            close_old_connections()
+            self.flush()
+
+
+like_buffer = LikeBuffer()
@@ -0,0 +1,230 @@
+import json
+import random
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from rest_framework.authtoken.models import Token
+from rest_framework.reverse import reverse
+from rest_framework.views import APIView
+
+from post.benchmark import summarize, format_table, request_host
+from post.like_buffer import like_buffer
+from post.models import Comment, Like, Post, Tag
+from post.timeline import home_timeline
+
+COLUMNS = ["endpoint", "rps", "p50_ms", "p95_ms", "p99_ms", "queries", "errors"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the API endpoints in-process against the current database and "
+        "report throughput, latency percentiles and queries per request"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Requests per endpoint"
+        )
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument(
+            "--endpoint", nargs="+", help="Only benchmark these endpoints"
+        )
+        parser.add_argument(
+            "--email",
+            help="User to authenticate as, defaults to the user following most users",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--keep-writes",
+            action="store_true",
+            help="Keep rows written by the benchmark instead of removing them",
+        )
+        parser.add_argument("--json", action="store_true", help="Print results as JSON")
+        parser.add_argument(
+            "--compare",
+            help="JSON results of a previous run to show relative changes against",
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(is_active=True)
+        if options["email"]:
+            users = users.filter(email=options["email"])
+        user = users.order_by("-following_count", "pk").first()
+        if user is None:
+            raise CommandError(
+                "No user to authenticate as, run generate_social_graph first"
+            )
+
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client = Client(
+            SERVER_NAME=request_host(), HTTP_AUTHORIZATION=f"Token {token.key}"
+        )
+        self.rng = random.Random(options["seed"])
+        self.post_ids = list(
+            home_timeline(user).values_list("pk", flat=True)[:1000]
+        ) or list(Post.objects.values_list("pk", flat=True)[:1000])
+        self.user_ids = list(
+            get_user_model()
+            .objects.exclude(pk=user.pk)
+            .values_list("pk", flat=True)[:1000]
+        )
+        self.tags = list(Tag.objects.values_list("name", flat=True)[:100])
+        self.usernames = list(
+            get_user_model().objects.values_list("username", flat=True)[:100]
+        )
+
+        endpoints = self.endpoints()
+        selected = options["endpoint"] or list(endpoints)
+        unknown = set(selected) - set(endpoints)
+        if unknown:
+            raise CommandError(
+                f"Unknown endpoint(s) {', '.join(sorted(unknown))}, "
+                f"choose from {', '.join(endpoints)}"
+            )
+
+        results = []
+        # Requests commit like in production, so writes pay for their commits
+        # and on_commit work; the rows they wrote are removed afterwards.
+        snapshot = self.snapshot(user)
+        # Throttling would reject most of the benchmark requests.
+        with mock.patch.object(APIView, "throttle_classes", []):
+            try:
+                for name in selected:
+                    results.append(
+                        {
+                            "endpoint": name,
+                            **self.run(
+                                endpoints[name], options["requests"], options["warmup"]
+                            ),
+                        }
+                    )
+            finally:
+                if not options["keep_writes"]:
+                    self.restore(user, snapshot)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        columns = COLUMNS
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                baseline = {row["endpoint"]: row for row in json.load(file)}
+            for row in results:
+                previous = baseline.get(row["endpoint"])
+                for metric in ("rps", "p99_ms"):
+                    row[f"{metric} change"] = (
+                        f"{(row[metric] / previous[metric] - 1) * 100:+.1f}%"
+                        if previous and previous[metric]
+                        else "-"
+                    )
+            columns = COLUMNS + ["rps change", "p99_ms change"]
+
+        self.stdout.write(format_table(results, columns))
+
+    def snapshot(self, user):
+        return {
+            "liked": set(
+                Like.objects.filter(user=user).values_list("post_id", flat=True)
+            ),
+            "following": set(user.following.values_list("pk", flat=True)),
+            "last_comment": Comment.objects.aggregate(last=Max("pk"))["last"] or 0,
+        }
+
+    def restore(self, user, snapshot):
+        """Undo the likes, comments and follows of the benchmark requests"""
+        like_buffer.flush()
+        User = get_user_model()
+
+        liked = set(Like.objects.filter(user=user).values_list("post_id", flat=True))
+        Like.objects.filter(user=user, post_id__in=liked - snapshot["liked"]).delete()
+        for post in Post.objects.filter(pk__in=snapshot["liked"] - liked):
+            post.like(user)
+
+        following = set(user.following.values_list("pk", flat=True))
+        for profile in User.objects.filter(pk__in=following - snapshot["following"]):
+            user.unfollow(profile)
+        user.follow(*User.objects.filter(pk__in=snapshot["following"] - following))
+
+        Comment.objects.filter(user=user, pk__gt=snapshot["last_comment"]).delete()
+
+    def endpoints(self):
+        def choice(values):
+            return lambda: self.rng.choice(values) if values else 0
+
+        post_id, user_id = choice(self.post_ids), choice(self.user_ids)
+        tag, username = choice(self.tags), choice(self.usernames)
+
+        return {
+            "feed": ("get", lambda: reverse("post:post-list")),
+            "feed_by_tag": (
+                "get",
+                lambda: f"{reverse('post:post-list')}?tag={tag()}",
+            ),
+            "post_detail": (
+                "get",
+                lambda: reverse("post:post-detail", args=[post_id()]),
+            ),
+            "post_comments": (
+                "get",
+                lambda: reverse("post:post-comments", args=[post_id()]),
+            ),
+            "post_likes": ("get", lambda: reverse("post:post-likes", args=[post_id()])),
+            "liked_posts": ("get", lambda: reverse("post:liked-posts")),
+            "like_toggle": (
+                "post",
+                lambda: reverse("post:like-unlike", args=[post_id()]),
+            ),
+            "comment": ("post", lambda: reverse("post:comment", args=[post_id()])),
+            "users": ("get", lambda: reverse("user:user-list")),
+            "user_search": (
+                "get",
+                lambda: f"{reverse('user:user-list')}?username={username()}",
+            ),
+            "user_detail": (
+                "get",
+                lambda: reverse("user:user-detail", args=[user_id()]),
+            ),
+            "followers": ("get", lambda: reverse("user:followers")),
+            "following": ("get", lambda: reverse("user:following")),
+            "follow_toggle": (
+                "post",
+                lambda: reverse("user:follow-unfollow", args=[user_id()]),
+            ),
+        }
+
+    def run(self, endpoint, requests, warmup):
+        method, url = endpoint
+        request = getattr(self.client, method)
+        data = {"text": "Benchmark comment"} if method == "post" else None
+
+        for _ in range(warmup):
+            request(url(), data)
+
+        queries = 0
+
+        def count_queries(execute, *args):
+            nonlocal queries
+            queries += 1
+            return execute(*args)
+
+        latencies, errors = [], 0
+        with connection.execute_wrapper(count_queries):
+            started = time.perf_counter()
+            for _ in range(requests):
+                path = url()
+                request_started = time.perf_counter()
+                response = request(path, data)
+                latencies.append(time.perf_counter() - request_started)
+                errors += response.status_code >= 400
+            elapsed = time.perf_counter() - started
+
+        return {
+            **summarize(latencies, errors, elapsed),
+            "queries": round(queries / requests, 1),
+        }
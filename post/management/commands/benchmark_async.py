@@ -0,0 +1,186 @@
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from rest_framework.authtoken.models import Token
+from rest_framework.views import APIView
+
+from post.benchmark import summarize, format_table, request_host
+
+ENDPOINTS = {
+    "feed": ("/api/post/posts/", "/api/post/async/posts/"),
+    "liked_posts": ("/api/post/liked_posts/", "/api/post/async/liked_posts/"),
+    "users": ("/api/user/users/", "/api/user/async/users/"),
+    "followers": ("/api/user/followers/", "/api/user/async/followers/"),
+    "following": ("/api/user/following/", "/api/user/async/following/"),
+}
+
+
+def run_wsgi(path, token, clients, total):
+    application = get_wsgi_application()
+    host = request_host()
+
+    def call(_):
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": "",
+            "SERVER_NAME": host,
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": host,
+            "HTTP_AUTHORIZATION": f"Token {token}",
+            "wsgi.input": io.BytesIO(),
+            "wsgi.errors": io.StringIO(),
+            "wsgi.url_scheme": "http",
+        }
+        statuses = []
+        started = time.perf_counter()
+        response = application(environ, lambda status, *_: statuses.append(status))
+        b"".join(response)
+        response.close()
+        latency = time.perf_counter() - started
+        connections.close_all()
+        return latency, statuses[0].startswith("2")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(call, range(total)))
+    elapsed = time.perf_counter() - started
+
+    return summarize(
+        [latency for latency, _ in results],
+        sum(1 for _, ok in results if not ok),
+        elapsed,
+    )
+
+
+async def run_asgi(path, token, clients, total):
+    application = get_asgi_application()
+    host = request_host()
+    slots = asyncio.Semaphore(clients)
+
+    async def call():
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", host.encode()),
+                (b"authorization", f"Token {token}".encode()),
+            ],
+            "server": (host, 80),
+            "client": ("127.0.0.1", 0),
+        }
+        statuses = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        async with slots:
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            return time.perf_counter() - started, 200 <= statuses[0] < 300
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(call() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    return summarize(
+        [latency for latency, _ in results],
+        sum(1 for _, ok in results if not ok),
+        elapsed,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests per second and latency of the sync (WSGI) and "
+        "async (ASGI) read endpoints at several concurrency levels"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, nargs="+", default=[50, 200, 1000])
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=2000,
+            help="Number of requests per endpoint and concurrency level",
+        )
+        parser.add_argument(
+            "--endpoint", choices=sorted(ENDPOINTS), nargs="+", default=["feed"]
+        )
+        parser.add_argument(
+            "--email", help="User to authenticate as, defaults to the first user"
+        )
+        parser.add_argument("--json", action="store_true", help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(is_active=True).order_by("pk")
+        if options["email"]:
+            users = users.filter(email=options["email"])
+        user = users.first()
+        if user is None:
+            raise CommandError("No user to authenticate as, seed the database first")
+        token, _ = Token.objects.get_or_create(user=user)
+
+        results = []
+        # Throttling would reject most of the benchmark requests.
+        with mock.patch.object(APIView, "throttle_classes", []):
+            for endpoint in options["endpoint"]:
+                wsgi_path, asgi_path = ENDPOINTS[endpoint]
+                for clients in options["clients"]:
+                    total = max(options["requests"], clients)
+                    for server, stats in (
+                        ("wsgi", run_wsgi(wsgi_path, token.key, clients, total)),
+                        (
+                            "asgi",
+                            asyncio.run(run_asgi(asgi_path, token.key, clients, total)),
+                        ),
+                    ):
+                        results.append(
+                            {
+                                "endpoint": endpoint,
+                                "server": server,
+                                "clients": clients,
+                                **stats,
+                            }
+                        )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            format_table(
+                results,
+                [
+                    "endpoint",
+                    "server",
+                    "clients",
+                    "rps",
+                    "p50_ms",
+                    "p95_ms",
+                    "p99_ms",
+                    "errors",
+                ],
+            )
+        )
@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from post.query_plans import QueryPlanGuard
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every post and user route and report full table scans, "
+        "temp B-tree sorts and requests over the query budget"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--email",
+            help="User to request as, defaults to the user following most users",
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(is_active=True)
+        if options["email"]:
+            users = users.filter(email=options["email"])
+        user = users.order_by("-following_count", "pk").first()
+        if user is None:
+            raise CommandError("No user to request as")
+
+        problems = QueryPlanGuard(user).check()
+        for problem in problems:
+            self.stdout.write(str(problem))
+
+        if problems:
+            raise CommandError(f"{len(problems)} query plan problem(s)")
+        self.stdout.write(self.style.SUCCESS("No query plan problems"))
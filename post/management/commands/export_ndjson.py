@@ -0,0 +1,53 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from post.export import (
+    current_watermark,
+    export_ndjson,
+    format_watermark,
+    gzip_chunks,
+    parse_watermark,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream tags, posts, comments, likes and follow edges as NDJSON in "
+        "fixture format, printing the watermark for the next incremental export"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-o", "--output", help="Output file, defaults to standard output"
+        )
+        parser.add_argument(
+            "--since",
+            help="Watermark of a previous export, only newer rows are exported",
+        )
+        parser.add_argument("--gzip", action="store_true", help="Compress output")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_watermark(options["since"]) if options["since"] else None
+        except ValueError as error:
+            raise CommandError(error)
+
+        until = current_watermark()
+        chunks = export_ndjson(since, until, chunk_size=options["chunk_size"])
+
+        if options["gzip"]:
+            chunks = gzip_chunks(chunks)
+
+        if options["output"]:
+            mode, encoding = ("wb", None) if options["gzip"] else ("w", "utf-8")
+            with open(options["output"], mode, encoding=encoding) as file:
+                file.writelines(chunks)
+        elif options["gzip"]:
+            sys.stdout.buffer.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+
+        self.stderr.write(f"Watermark: {format_watermark(until)}")
@@ -0,0 +1,161 @@
+import itertools
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.utils import timezone
+
+from post.bulk_import import BulkImporter
+from post.models import Tag, Post, Comment, Like
+
+
+def next_pk(model):
+    return (model.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+
+
+def zipf_weights(count, exponent):
+    return list(
+        itertools.accumulate(1 / rank**exponent for rank in range(1, count + 1))
+    )
+
+
+def power_law_degree(rng, mean, limit):
+    # Pareto with shape 2 has mean 2 * scale
+    return min(limit, int(rng.paretovariate(2) * mean / 2))
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic social graph with a power-law follow graph, "
+        "posts, tags, likes and comments using bulk inserts"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument(
+            "--following", type=float, default=50, help="Mean users followed per user"
+        )
+        parser.add_argument(
+            "--exponent",
+            type=float,
+            default=1.0,
+            help="Zipf exponent of user popularity, post popularity and tag use",
+        )
+        parser.add_argument("--tags", type=int, default=500)
+        parser.add_argument("--posts", type=int, default=100000)
+        parser.add_argument(
+            "--likes", type=float, default=20, help="Mean likes per post"
+        )
+        parser.add_argument(
+            "--comments", type=float, default=3, help="Mean comments per post"
+        )
+        parser.add_argument(
+            "--days", type=int, default=90, help="Spread posts over this many days"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--password",
+            default="password",
+            help="Password of all generated users",
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 2:
+            raise CommandError("At least two users are needed")
+
+        User = get_user_model()
+        rng = random.Random(options["seed"])
+        exponent = options["exponent"]
+        now = timezone.now()
+        period = timedelta(days=options["days"]).total_seconds()
+
+        importer = BulkImporter(
+            self.stdout,
+            batch_size=options["batch_size"],
+            verbosity=options["verbosity"],
+        )
+        with importer.importing():
+            # Lower user ids are followed more often. Posting activity follows
+            # the same power law over a shuffled ranking, so popular users do
+            # not also write most posts, which would inflate timelines.
+            first_user = next_pk(User)
+            user_ids = range(first_user, first_user + options["users"])
+            user_weights = zipf_weights(len(user_ids), exponent)
+            password = make_password(options["password"])
+            for user_id in user_ids:
+                following = set()
+                degree = power_law_degree(rng, options["following"], len(user_ids) - 1)
+                while len(following) < degree:
+                    followed_id = rng.choices(user_ids, cum_weights=user_weights)[0]
+                    if followed_id != user_id:
+                        following.add(followed_id)
+                importer.add(
+                    User(
+                        pk=user_id,
+                        email=f"user{user_id}@example.com",
+                        username=f"user{user_id}",
+                        password=password,
+                    ),
+                    {"following": following},
+                )
+
+            first_tag = next_pk(Tag)
+            tag_ids = range(first_tag, first_tag + options["tags"])
+            tag_weights = zipf_weights(len(tag_ids), exponent)
+            for tag_id in tag_ids:
+                importer.add(Tag(pk=tag_id, name=f"tag{tag_id}"))
+
+            authors = rng.sample(user_ids, len(user_ids))
+            first_post = next_pk(Post)
+            post_times = sorted(
+                now - timedelta(seconds=rng.random() * period)
+                for _ in range(options["posts"])
+            )
+            for post_id, created_at in enumerate(post_times, start=first_post):
+                tags = (
+                    set(
+                        rng.choices(
+                            tag_ids, cum_weights=tag_weights, k=rng.randint(0, 3)
+                        )
+                    )
+                    if tag_ids
+                    else set()
+                )
+                importer.add(
+                    Post(
+                        pk=post_id,
+                        title=f"Post {post_id}",
+                        content=f"Synthetic post {post_id}",
+                        created_at=created_at,
+                        author_id=rng.choices(authors, cum_weights=user_weights)[0],
+                    ),
+                    {"tags": tags},
+                )
+
+                age = (now - created_at).total_seconds()
+                likes = power_law_degree(rng, options["likes"], len(user_ids))
+                for user_id in rng.sample(user_ids, likes):
+                    importer.add(
+                        Like(
+                            user_id=user_id,
+                            post_id=post_id,
+                            created_at=created_at
+                            + timedelta(seconds=rng.random() * age),
+                        )
+                    )
+                for _ in range(power_law_degree(rng, options["comments"], 1000)):
+                    importer.add(
+                        Comment(
+                            user_id=rng.choice(user_ids),
+                            post_id=post_id,
+                            text="Synthetic comment",
+                            created_at=created_at
+                            + timedelta(seconds=rng.random() * age),
+                        )
+                    )
+
+        importer.report(self.style)
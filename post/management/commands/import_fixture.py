@@ -0,0 +1,117 @@
+import gzip
+import json
+import re
+import sys
+
+from django.core import serializers
+from django.core.serializers.base import DeserializationError
+from django.core.management.base import BaseCommand, CommandError
+
+from post.bulk_import import BulkImporter
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def iter_json_array(file, chunk_size=1 << 20):
+    """Yield objects of a top-level JSON array, reading the file in chunks"""
+    decoder = json.JSONDecoder()
+    buffer, pos = "", 0
+    started = separated = False
+
+    while True:
+        pos = WHITESPACE.match(buffer, pos).end()
+        if pos == len(buffer):
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise ValueError("Unexpected end of fixture")
+            buffer, pos = chunk, 0
+            continue
+
+        char = buffer[pos]
+        if not started:
+            if char != "[":
+                raise ValueError("Fixture must be a JSON array")
+            started = separated = True
+            pos += 1
+        elif char == "]":
+            return
+        elif char == "," and not separated:
+            separated = True
+            pos += 1
+        elif char == "{" and separated:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    raise
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            separated = False
+            pos = end
+            yield item
+        else:
+            raise ValueError(f"Unexpected {char!r} in fixture array")
+
+
+def iter_ndjson(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a JSON or NDJSON fixture into the database with batched inserts, "
+        "then rebuild counters and timelines"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixture", help="Fixture path, '-' reads stdin")
+        parser.add_argument(
+            "--format",
+            choices=["json", "ndjson"],
+            help="Defaults to ndjson for .ndjson and .jsonl files, json otherwise",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--keep-indexes",
+            action="store_true",
+            help="Do not drop secondary indexes of imported models during the import",
+        )
+        parser.add_argument(
+            "--skip-timelines",
+            action="store_true",
+            help="Do not fan imported posts out to home timelines",
+        )
+
+    def handle(self, *args, **options):
+        path = options["fixture"]
+        format = options["format"] or (
+            "ndjson" if re.search(r"\.(ndjson|jsonl)(\.gz)?$", path) else "json"
+        )
+        if path == "-":
+            file = sys.stdin
+        elif path.endswith(".gz"):
+            file = gzip.open(path, "rt", encoding="utf-8")
+        else:
+            file = open(path, encoding="utf-8")
+
+        importer = BulkImporter(
+            self.stdout,
+            batch_size=options["batch_size"],
+            keep_indexes=options["keep_indexes"],
+            skip_timelines=options["skip_timelines"],
+            verbosity=options["verbosity"],
+        )
+        try:
+            with file, importer.importing():
+                objects = (
+                    iter_ndjson(file) if format == "ndjson" else iter_json_array(file)
+                )
+                for deserialized in serializers.deserialize("python", objects):
+                    importer.add(deserialized.object, deserialized.m2m_data)
+        except (ValueError, DeserializationError) as error:
+            raise CommandError(f"Invalid fixture: {error}")
+
+        importer.report(self.style)
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value, F, Q
+from django.db.models.functions import Coalesce
+
+from post.models import Post, Like, Comment
+
+
+def count_of(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(post=OuterRef("pk"))
+            .order_by()
+            .values("post")
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        Value(0),
+    )
+
+
+class Command(BaseCommand):
+    help = "Verify and rebuild denormalized like/comment counters on posts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report posts with drifted counters, do not fix them",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drifted_ids = list(
+                Post.objects.annotate(
+                    actual_likes=count_of(Like), actual_comments=count_of(Comment)
+                )
+                .filter(
+                    ~Q(like_count=F("actual_likes"))
+                    | ~Q(comment_count=F("actual_comments"))
+                )
+                .values_list("pk", flat=True)
+            )
+
+            if options["check"]:
+                for pk in drifted_ids:
+                    self.stdout.write(f"Post {pk} has drifted counters")
+                if drifted_ids:
+                    raise CommandError(f"{len(drifted_ids)} post(s) out of sync")
+                self.stdout.write(self.style.SUCCESS("All post counters are in sync"))
+                return
+
+            Post.objects.filter(pk__in=drifted_ids).update(
+                like_count=count_of(Like), comment_count=count_of(Comment)
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt counters for {len(drifted_ids)} post(s)")
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from post.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = "Fan out existing posts into home timelines, e.g. after loading fixtures"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_timelines()
+
+        self.stdout.write(self.style.SUCCESS("Rebuilt home timelines"))
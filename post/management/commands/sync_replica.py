@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database to the local stand-in read replicas, "
+        "simulating replication"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "aliases", nargs="*", help="Replicas to copy to, defaults to all"
+        )
+
+    def handle(self, *args, **options):
+        aliases = options["aliases"] or [
+            alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS
+        ]
+        primary = connections[DEFAULT_DB_ALIAS]
+
+        for alias in aliases:
+            if alias not in connections:
+                raise CommandError(f"Unknown database {alias!r}")
+            replica = connections[alias]
+            if primary.vendor != "sqlite" or replica.vendor != "sqlite":
+                raise CommandError(
+                    "Only SQLite databases can be copied, other replicas are "
+                    "kept up to date by the database server"
+                )
+
+            primary.ensure_connection()
+            replica.ensure_connection()
+            primary.connection.backup(replica.connection)
+            self.stdout.write(f"Copied {DEFAULT_DB_ALIAS} to {alias}")
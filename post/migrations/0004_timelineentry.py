@@ -0,0 +1,88 @@
+# Generated by Django 4.2.6 on 2026-10-18 01:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_timelines(apps, schema_editor):
+    Post = apps.get_model("post", "Post")
+    TimelineEntry = apps.get_model("post", "TimelineEntry")
+    Following = apps.get_model("user", "User").following.through
+
+    followers = {}
+    for follower_id, author_id in Following.objects.values_list(
+        "from_user_id", "to_user_id"
+    ).iterator():
+        followers.setdefault(author_id, []).append(follower_id)
+
+    batch = []
+    for post_id, author_id, created_at in Post.objects.values_list(
+        "pk", "author_id", "created_at"
+    ).iterator():
+        for user_id in [author_id, *followers.get(author_id, [])]:
+            batch.append(
+                TimelineEntry(user_id=user_id, post_id=post_id, created_at=created_at)
+            )
+        if len(batch) >= 1000:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("post", "0003_post_like_count_post_comment_count"),
+        ("user", "0002_alter_user_first_name_alter_user_following_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TimelineEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline_entries",
+                        to="post.post",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline_entries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-created_at", "-post"],
+                        name="timeline_user_created_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="timelineentry",
+            constraint=models.UniqueConstraint(
+                fields=("user", "post"), name="unique_timeline_entry"
+            ),
+        ),
+        migrations.RunPython(populate_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.6 on 2026-10-18 01:29
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_likes(apps, schema_editor):
+    Like = apps.get_model("post", "Like")
+    Post = apps.get_model("post", "Post")
+
+    duplicates = (
+        Like.objects.order_by()
+        .values("user", "post")
+        .annotate(first_id=Min("pk"), total=Count("pk"))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        Like.objects.filter(user=duplicate["user"], post=duplicate["post"]).exclude(
+            pk=duplicate["first_id"]
+        ).delete()
+        Post.objects.filter(pk=duplicate["post"]).update(
+            like_count=Like.objects.filter(post=duplicate["post"]).count()
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0005_post_created_idx_post_author_created_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="like",
+            constraint=models.UniqueConstraint(
+                fields=("user", "post"), name="unique_like"
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-18 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0007_comment_like_post_created_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="picture_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -2,7 +2,7 @@ import os
 import uuid
 
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.utils.text import slugify
 
 
@@ -29,13 +29,37 @@ class Post(models.Model):
     )
     tags = models.ManyToManyField(Tag, blank=True, related_name="posts")
     picture = models.ImageField(upload_to=post_image_file_path, blank=True, null=True)
+    picture_variants = models.JSONField(default=dict, blank=True, editable=False)
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="post_created_idx"),
+            models.Index(
+                fields=["author", "-created_at", "-id"],
+                name="post_author_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def like(self, user):
+        """Like post by given user and return whether it was not liked yet"""
+        try:
+            with transaction.atomic():
+                self.likes.create(user=user)
+        except IntegrityError:
+            return False
+        return True
+
+    def unlike(self, user):
+        """Remove like of given user and return whether it was liked"""
+        deleted, _ = self.likes.filter(user=user).delete()
+        return bool(deleted)
+
 
 class Comment(models.Model):
     text = models.TextField()
@@ -46,7 +70,12 @@ class Comment(models.Model):
     )
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(
+                fields=["post", "-created_at", "-id"], name="comment_post_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Comment by {self.user} at {self.created_at} - {self.text}"
@@ -59,5 +88,42 @@ class Like(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"], name="unique_like"),
+        ]
+        indexes = [
+            models.Index(
+                fields=["post", "-created_at", "-id"], name="like_post_created_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"Liked by {self.user} at {self.created_at}"
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_timeline_entry"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at", "-post"],
+                name="timeline_user_created_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.post} in timeline of {self.user}"
@@ -0,0 +1,198 @@
+import re
+from importlib import import_module
+from typing import NamedTuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.urls import URLPattern, URLResolver, reverse
+from rest_framework.test import APIClient
+
+from post.benchmark import request_host
+from post.timeline import visible_posts
+
+# Routes are requested once per query string listed here, `{pk}` filled like
+# the `pk` of the route, and plainly otherwise.
+ROUTE_QUERY_STRINGS = {
+    "post:post-list": ["", "tag=tag"],
+    "post:post-batch": ["ids={pk}"],
+    "user:user-list": ["", "username=user"],
+    "user:user-batch": ["ids={pk}"],
+}
+
+# The objects visible to the user whose first primary key fills the `pk` of
+# the routes of each URLconf.
+PK_QUERYSETS = {
+    "post.urls": visible_posts,
+    "user.urls": lambda user: get_user_model().objects.exclude(pk=user.pk),
+}
+
+SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)$")
+TEMP_B_TREE = re.compile(r"USE TEMP B-TREE FOR (?:.* )?ORDER BY")
+TABLE_ALIAS = re.compile(r'"(\w+)" ([TU]\d+)\b')
+EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "WITH")
+# Savepoints come from the transaction the checks run in, not from the routes.
+TRANSACTION_CONTROL = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+class QueryPlanProblem(NamedTuple):
+    route: str
+    kind: str
+    detail: str
+    sql: str = ""
+
+    def __str__(self):
+        problem = f"{self.route}: {self.kind} {self.detail}"
+        return f"{problem}\n    {self.sql}" if self.sql else problem
+
+
+def explain(sql, params):
+    """Return the EXPLAIN QUERY PLAN details of an SQLite query"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(sql, details):
+    """Full table scans and sorts in temp B-trees for ORDER BY of a query plan"""
+    aliases = dict((alias, table) for table, alias in TABLE_ALIAS.findall(sql))
+    problems = []
+    for detail in details:
+        scan = SCAN.match(detail)
+        if scan:
+            table = aliases.get(scan[1], scan[1])
+            if not table.startswith("subquery"):
+                problems.append(("full scan", table))
+        elif TEMP_B_TREE.search(detail):
+            problems.append(("temp b-tree", "for ORDER BY"))
+    return problems
+
+
+def routes(urlconf):
+    """Yield the names, patterns and views of the routes of an URLconf"""
+    module = import_module(urlconf)
+    namespace = getattr(module, "app_name", None)
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                if "format" in pattern.pattern.regex.groupindex:
+                    continue
+                name = f"{namespace}:{pattern.name}" if namespace else pattern.name
+                yield name, pattern, pattern.callback
+
+    yield from walk(module.urlpatterns)
+
+
+def route_method(view):
+    """GET if the view supports it, otherwise its first unsafe method"""
+    actions = getattr(view, "actions", None)
+    if actions:
+        methods = [method.upper() for method in actions]
+    else:
+        view_class = getattr(view, "cls", None) or getattr(view, "view_class", None)
+        methods = [
+            method.upper()
+            for method in getattr(view_class, "http_method_names", ())
+            if hasattr(view_class, method)
+        ]
+    if "GET" in methods:
+        return "GET"
+    unsafe = [method for method in methods if method in ("POST", "PUT", "PATCH")]
+    return unsafe[0] if unsafe else None
+
+
+class QueryPlanGuard:
+    """
+    Request every route of the given URLconfs as `user` and check the SQLite
+    query plans of the queries they run.
+
+    Server errors, client errors of GET routes, full table scans, temp B-trees sorting for ORDER BY and
+    requests running more than `QUERY_PLAN_BUDGET` queries are reported,
+    except for the known problems of a route listed in
+    `QUERY_PLAN_ALLOWED_PROBLEMS`. Writes made by the requests are rolled back.
+    """
+
+    def __init__(self, user, urlconfs=("post.urls", "user.urls")):
+        self.user = user
+        self.urlconfs = urlconfs
+        self.client = APIClient(
+            raise_request_exception=False, SERVER_NAME=request_host()
+        )
+        self.client.force_authenticate(user)
+
+    def check(self):
+        problems = []
+        with transaction.atomic():
+            for urlconf in self.urlconfs:
+                queryset = PK_QUERYSETS[urlconf](self.user)
+                pk = queryset.order_by("pk").values_list("pk", flat=True).first()
+                for name, pattern, view in routes(urlconf):
+                    method = route_method(view)
+                    if method is None:
+                        continue
+                    kwargs = (
+                        {"pk": pk} if "pk" in pattern.pattern.regex.groupindex else {}
+                    )
+                    url = reverse(name, kwargs=kwargs)
+                    for query_string in ROUTE_QUERY_STRINGS.get(name, [""]):
+                        query_string = query_string.format(pk=pk)
+                        problems += self.check_request(
+                            name, method, f"{url}?{query_string}".rstrip("?")
+                        )
+            transaction.set_rollback(True)
+        return problems
+
+    def check_request(self, name, method, url, follow_next=True):
+        route = f"{method} {url} ({name})"
+        response, queries = self.capture(method, url)
+
+        allowed = settings.QUERY_PLAN_ALLOWED_PROBLEMS.get(name, ())
+        problems = []
+        if response.status_code >= 500:
+            problems.append(
+                QueryPlanProblem(route, "server error", str(response.status_code))
+            )
+        elif response.status_code >= 400 and method == "GET":
+            # The queries of a route that failed early were never checked.
+            if f"client error {response.status_code}" not in allowed:
+                problems.append(
+                    QueryPlanProblem(route, "client error", str(response.status_code))
+                )
+        if len(queries) > settings.QUERY_PLAN_BUDGET:
+            problems.append(
+                QueryPlanProblem(
+                    route,
+                    "query budget",
+                    f"{len(queries)} queries, budget {settings.QUERY_PLAN_BUDGET}",
+                )
+            )
+
+        seen = set()
+        for sql, params in queries:
+            if sql in seen or not sql.lstrip().upper().startswith(EXPLAINABLE):
+                continue
+            seen.add(sql)
+            for kind, detail in plan_problems(sql, explain(sql, params)):
+                if f"{kind} {detail}" not in allowed:
+                    problems.append(QueryPlanProblem(route, kind, detail, sql))
+
+        # The following page of a cursor paginated list runs a keyset query.
+        data = getattr(response, "data", None)
+        if follow_next and isinstance(data, dict) and data.get("next"):
+            problems += self.check_request(name, method, data["next"], False)
+        return problems
+
+    def capture(self, method, url):
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            if not many and not sql.startswith(TRANSACTION_CONTROL):
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            response = getattr(self.client, method.lower())(url)
+        return response, queries
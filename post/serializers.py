@@ -1,37 +1,105 @@
+from collections import defaultdict
+from operator import itemgetter
+
+from django.contrib.auth import get_user_model
+
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 
+from post.like_buffer import like_buffer
 from post.models import Tag, Post, Comment, Like
+from social_media_api.fieldsets import Fieldset, FieldsetMixin
+from social_media_api.images import (
+    PictureField,
+    PictureVariantsField,
+    picture_url,
+    picture_variant_urls,
+)
+from social_media_api.timing import TimedSerializerMixin
+from user.serializers import UserSummarySerializer
+
+# Reversed in place of a primary key to split URLs into a prefix and suffix.
+PK_PLACEHOLDER = 9007199254740993
 
+# Model fields read by post serializer fields whose names are no columns,
+# with a `+` suffix when expanded.
+POST_FIELD_COLUMNS = {
+    "tags": (),
+    "picture": ("picture", "picture_variants"),
+    "picture_variants": ("picture", "picture_variants"),
+    "author": ("author__username",),
+    "author+": (
+        "author__id",
+        "author__username",
+        "author__picture",
+        "author__picture_variants",
+    ),
+    "likes": ("like_count",),
+    "comments": ("comment_count",),
+    "like": (),
+    "comment": (),
+    "recent_likes": (),
+    "recent_comments": (),
+}
 
-class TagSerializer(serializers.ModelSerializer):
+
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ("id", "name")
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = ("id", "text", "created_at")
 
 
-class LikeSerializer(serializers.ModelSerializer):
+class CommentListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    user = serializers.SlugRelatedField(slug_field="username", read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ("id", "user", "text", "created_at")
+
+
+class LikeListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    user = serializers.SlugRelatedField(slug_field="username", read_only=True)
+
     class Meta:
         model = Like
-        fields = ("id", "created_at")
+        fields = ("id", "user", "created_at")
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = ("id", "title", "content", "created_at", "tags", "picture")
 
+    def update(self, instance, validated_data):
+        tags = validated_data.pop("tags", None)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
 
-class PostListSerializer(serializers.ModelSerializer):
+        # Like and comment counters change through F() updates while the
+        # request runs, so only the changed fields are saved.
+        instance.save(update_fields=list(validated_data))
+        if tags is not None:
+            instance.tags.set(tags)
+        return instance
+
+
+class PostListSerializer(
+    TimedSerializerMixin, FieldsetMixin, serializers.ModelSerializer
+):
     author = serializers.SlugRelatedField(slug_field="username", read_only=True)
     tags = serializers.SlugRelatedField(many=True, read_only=True, slug_field="name")
-    likes = serializers.IntegerField(source="likes.count")
-    comments = serializers.IntegerField(source="comments.count")
+    picture = PictureField(variant="feed")
+    picture_variants = PictureVariantsField()
+    likes = serializers.SerializerMethodField()
+    comments = serializers.IntegerField(source="comment_count", read_only=True)
     like = serializers.HyperlinkedIdentityField(
         view_name="post:like-unlike", lookup_field="pk"
     )
@@ -48,14 +116,160 @@ class PostListSerializer(serializers.ModelSerializer):
             "created_at",
             "tags",
             "picture",
+            "picture_variants",
             "author",
             "likes",
             "comments",
             "like",
             "comment",
         )
+        expandable_fields = ("author",)
+
+    def get_expanded_field(self, name):
+        return UserSummarySerializer(read_only=True)
+
+    @extend_schema_field(OpenApiTypes.INT)
+    def get_likes(self, obj):
+        return obj.like_count + like_buffer.pending_delta(obj.pk)
 
 
 class PostDetailSerializer(PostListSerializer):
-    likes = serializers.StringRelatedField(many=True, read_only=True)
-    comments = serializers.StringRelatedField(many=True, read_only=True)
+    recent_items = 3
+
+    picture = PictureField(variant="full")
+
+    recent_likes = serializers.SerializerMethodField()
+    recent_comments = serializers.SerializerMethodField()
+
+    class Meta(PostListSerializer.Meta):
+        fields = PostListSerializer.Meta.fields + ("recent_likes", "recent_comments")
+
+    @extend_schema_field(LikeListSerializer(many=True))
+    def get_recent_likes(self, obj):
+        likes = obj.likes.select_related("user").order_by("-created_at", "-id")
+        return LikeListSerializer(likes[: self.recent_items], many=True).data
+
+    @extend_schema_field(CommentListSerializer(many=True))
+    def get_recent_comments(self, obj):
+        comments = obj.comments.select_related("user").order_by("-created_at", "-id")
+        return CommentListSerializer(comments[: self.recent_items], many=True).data
+
+
+class PostFeedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    def to_representation(self, data):
+        rows = list(data)
+        self.child.prepare(rows)
+        return [self.child.to_representation(row) for row in rows]
+
+
+class PostFeedSerializer(serializers.BaseSerializer):
+    """
+    Read-only fast path rendering the same output as PostListSerializer.
+
+    Serializes rows of `.values(*PostFeedSerializer.values(fieldset))`
+    instead of posts. Tag names of all rows are fetched in a single query and
+    the like/comment URLs are reversed once and filled in per row, so no
+    field objects or `reverse()` calls are involved per row.
+    """
+
+    class Meta:
+        list_serializer_class = PostFeedListSerializer
+        fields = PostListSerializer.Meta.fields
+        expandable_fields = PostListSerializer.Meta.expandable_fields
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.renderers = None
+
+    @classmethod
+    def values(cls, fieldset):
+        return [
+            "id" if column == "pk" else column
+            for column in fieldset.columns(POST_FIELD_COLUMNS)
+        ]
+
+    def url_template(self, view_name):
+        url = reverse(
+            view_name,
+            kwargs={"pk": PK_PLACEHOLDER},
+            request=self.context.get("request"),
+            format=self.context.get("format"),
+        )
+        prefix, _, suffix = url.rpartition(str(PK_PLACEHOLDER))
+        return prefix, suffix
+
+    def link(self, view_name):
+        prefix, suffix = self.url_template(view_name)
+        return lambda row: f"{prefix}{row['id']}{suffix}"
+
+    def tags(self, rows):
+        tags = defaultdict(list)
+        if rows:
+            post_tags = (
+                Post.tags.through.objects.filter(
+                    post_id__in=[row["id"] for row in rows]
+                )
+                .order_by("post_id", "tag_id")
+                .values_list("post_id", "tag__name")
+            )
+            for post_id, name in post_tags:
+                tags[post_id].append(name)
+        return lambda row: tags[row["id"]]
+
+    def author(self, fieldset):
+        if not fieldset.is_expanded("author"):
+            return itemgetter("author__username")
+
+        request = self.context.get("request")
+        storage = get_user_model()._meta.get_field("picture").storage
+        return lambda row: {
+            "id": row["author__id"],
+            "username": row["author__username"],
+            "picture": picture_url(
+                storage,
+                row["author__picture"],
+                row["author__picture_variants"],
+                "thumbnail",
+                request,
+            ),
+        }
+
+    def renderer(self, name, fieldset, rows):
+        request = self.context.get("request")
+        storage = Post._meta.get_field("picture").storage
+
+        if name == "created_at":
+            created_at = serializers.DateTimeField().to_representation
+            return lambda row: created_at(row["created_at"])
+        if name == "tags":
+            return self.tags(rows)
+        if name == "picture":
+            return lambda row: picture_url(
+                storage, row["picture"], row["picture_variants"], "feed", request
+            )
+        if name == "picture_variants":
+            return lambda row: picture_variant_urls(
+                storage, row["picture"], row["picture_variants"], request
+            )
+        if name == "author":
+            return self.author(fieldset)
+        if name == "likes":
+            return lambda row: row["like_count"] + like_buffer.pending_delta(row["id"])
+        if name == "comments":
+            return itemgetter("comment_count")
+        if name == "like":
+            return self.link("post:like-unlike")
+        if name == "comment":
+            return self.link("post:comment")
+        return itemgetter(name)
+
+    def prepare(self, rows):
+        fieldset = Fieldset(self.context.get("request"), type(self))
+        self.renderers = [
+            (name, self.renderer(name, fieldset, rows)) for name in fieldset.fields
+        ]
+
+    def to_representation(self, row):
+        if self.renderers is None:
+            self.prepare([row])
+        return {name: render(row) for name, render in self.renderers}
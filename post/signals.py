@@ -0,0 +1,129 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from post.cache import post_detail_cache
+from post.models import Post, Comment, Like
+from post.timeline import (
+    fan_out_post,
+    backfill_followers,
+    backfill_timeline,
+    trim_timeline,
+)
+from social_media_api.images import image_pipeline
+
+
+def _change_counter(post_id, field, delta):
+    Post.objects.filter(pk=post_id).update(**{field: F(field) + delta})
+
+
+def _deleted_with_post(instance, origin):
+    """Whether a like or comment is deleted because its post is deleted too"""
+    if isinstance(origin, Post):
+        return instance.post_id == origin.pk
+    if isinstance(origin, QuerySet):
+        return origin.model is Post
+    if isinstance(origin, get_user_model()):
+        # Posts of a deleted user are deleted with it, after their likes.
+        if not hasattr(origin, "_deleted_post_ids"):
+            origin._deleted_post_ids = set(origin.posts.values_list("pk", flat=True))
+        return instance.post_id in origin._deleted_post_ids
+    return False
+
+
+@receiver(post_save, sender=Like)
+def increment_like_count(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        _change_counter(instance.post_id, "like_count", 1)
+
+
+@receiver(post_delete, sender=Like)
+def decrement_like_count(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_post(instance, origin):
+        _change_counter(instance.post_id, "like_count", -1)
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        _change_counter(instance.post_id, "comment_count", 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_post(instance, origin):
+        _change_counter(instance.post_id, "comment_count", -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_detail(sender, instance, **kwargs):
+    post_detail_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_parent_post_detail(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_post(instance, origin):
+        post_detail_cache.invalidate(instance.post_id)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_tagged_post_detail(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if not reverse:
+        post_detail_cache.invalidate(instance.pk)
+    elif action == "pre_clear":
+        for post_id in instance.posts.values_list("pk", flat=True):
+            post_detail_cache.invalidate(post_id)
+    else:
+        for post_id in pk_set:
+            post_detail_cache.invalidate(post_id)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        fan_out_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def process_post_picture(sender, instance, raw, **kwargs):
+    if not raw:
+        image_pipeline.sync(instance)
+
+
+@receiver(m2m_changed, sender=get_user_model().following.through)
+def sync_timeline_with_following(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        related = instance.followers if reverse else instance.following
+        pk_set = set(related.values_list("pk", flat=True))
+    elif action not in ("post_add", "post_remove"):
+        return
+
+    User = get_user_model()
+    removed = action != "post_add"
+    # Follow counters are updated by the receivers of the user app, installed
+    # after this one, so they still hold the counts before the change here.
+    if reverse and removed:
+        backfill_followers(User.objects.get(pk=instance.pk), len(pk_set))
+
+    update_timeline = trim_timeline if removed else backfill_timeline
+    for other in User.objects.filter(pk__in=pk_set):
+        if reverse:
+            update_timeline(user=other, author=instance)
+        else:
+            if removed:
+                backfill_followers(other, 1)
+            update_timeline(user=instance, author=other)
+
+
+@receiver(pre_delete, sender=get_user_model())
+def backfill_followers_of_deleted_user(sender, instance, **kwargs):
+    for author in instance.following.all():
+        backfill_followers(author, 1)
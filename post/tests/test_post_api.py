@@ -1,17 +1,52 @@
-from rest_framework.test import APITestCase
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import time
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.conf import settings
+from django.db import connection, DatabaseError, IntegrityError
+from django.db.models import F
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APITransactionTestCase
 from django.contrib.auth import get_user_model
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.request import Request
 from rest_framework.reverse import reverse
+from rest_framework.serializers import BaseSerializer
 from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from PIL import Image
+from prometheus_client import REGISTRY
 
-from post.models import Post, Like, Tag, Comment
+from post.cache import post_detail_cache
+from post.like_buffer import like_buffer
+from post.management.commands.import_fixture import iter_json_array
+from post.models import Post, Like, Tag, Comment, TimelineEntry
+from post.query_plans import QueryPlanGuard, plan_problems
 from post.serializers import (
+    PostSerializer,
     PostListSerializer,
+    PostFeedSerializer,
     PostDetailSerializer,
     TagSerializer,
     CommentSerializer,
 )
+from social_media_api.fieldsets import Fieldset
+from social_media_api.images import render_variants
+from social_media_api.routers import ReadRouting
 
 POST_URL = reverse("post:post-list")
 
@@ -27,6 +62,12 @@ def sample_post(**params):
     return Post.objects.create(**defaults)
 
 
+def sample_image(size=(2000, 1000), **params):
+    buffer = BytesIO()
+    Image.new("RGB", size, "red").save(buffer, "JPEG", **params)
+    return buffer.getvalue()
+
+
 def sample_tag(**params):
     defaults = {"name": "Tag"}
     defaults.update(params)
@@ -63,7 +104,7 @@ class AuthenticatedPostApiTests(APITestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_create_post(self):
         post_data = {"title": "Post", "content": "Content"}
@@ -105,6 +146,22 @@ class AuthenticatedPostApiTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_update_keeps_concurrent_counter_changes(self):
+        post = sample_post(author=self.user)
+        tag = sample_tag()
+        serializer = PostSerializer(
+            post, data={"title": "New title", "tags": [tag.id]}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+
+        Post.objects.filter(pk=post.pk).update(like_count=F("like_count") + 1)
+        serializer.save()
+
+        post.refresh_from_db()
+        self.assertEqual(post.title, "New title")
+        self.assertEqual(post.like_count, 1)
+        self.assertEqual(list(post.tags.all()), [tag])
+
     def test_delete_post(self):
         post = sample_post(author=self.user)
 
@@ -124,6 +181,7 @@ class AuthenticatedPostApiTests(APITestCase):
         )
         post = sample_post(author=user)
         post.likes.add(Like.objects.create(user=self.user, post=post))
+        post.refresh_from_db()
 
         url = reverse("post:liked-posts")
 
@@ -133,7 +191,7 @@ class AuthenticatedPostApiTests(APITestCase):
         serializer = PostListSerializer(instance=post, context={"request": request})
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data[0], serializer.data)
+        self.assertEqual(response.data["results"][0], serializer.data)
 
     def test_list_tags(self):
         sample_tag()
@@ -147,7 +205,7 @@ class AuthenticatedPostApiTests(APITestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_tag_create(self):
         tag_data = {"name": "Tag"}
@@ -183,3 +241,1372 @@ class AuthenticatedPostApiTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(response.data["text"], serializer.data["text"])
+
+
+class PostCounterTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@gmail.com",
+            username="username",
+            password="secret_password",
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_like_and_unlike_update_like_count(self):
+        post = sample_post(author=self.user)
+        url = reverse("post:like-unlike", args=[post.id])
+
+        self.client.post(url)
+        post.refresh_from_db()
+        self.assertEqual(post.like_count, 1)
+
+        self.client.post(url)
+        post.refresh_from_db()
+        self.assertEqual(post.like_count, 0)
+
+    def test_comment_updates_comment_count(self):
+        post = sample_post(author=self.user)
+        url = reverse("post:comment", args=[post.id])
+
+        self.client.post(url, {"text": "Comment"})
+        post.refresh_from_db()
+
+        self.assertEqual(post.comment_count, 1)
+
+    def test_cascade_delete_updates_counters(self):
+        other = get_user_model().objects.create_user(
+            email="other@gmail.com", username="other", password="secret_password"
+        )
+        post = sample_post(author=self.user)
+        Like.objects.create(user=other, post=post)
+        Comment.objects.create(user=other, post=post, text="Comment")
+
+        other.delete()
+        post.refresh_from_db()
+
+        self.assertEqual(post.like_count, 0)
+        self.assertEqual(post.comment_count, 0)
+
+    def test_deleting_posts_skips_their_counters_and_cache(self):
+        others = [
+            get_user_model().objects.create_user(
+                email=f"other{i}@gmail.com", username=f"other{i}", password="secret"
+            )
+            for i in range(3)
+        ]
+        liked_post = sample_post(author=others[0])
+        Like.objects.create(user=self.user, post=liked_post)
+        posts = [sample_post(author=self.user) for _ in range(2)]
+        for post in posts:
+            for other in others:
+                Like.objects.create(user=other, post=post)
+                Comment.objects.create(user=other, post=post, text="Comment")
+
+        # Only the post deleted directly and the post liked by the deleted user
+        # are invalidated, and only the latter has its counter updated.
+        for delete, expected in ((posts[0].delete, 0), (self.user.delete, 1)):
+            with CaptureQueriesContext(connection) as queries, mock.patch.object(
+                post_detail_cache, "invalidate"
+            ) as invalidate:
+                delete()
+
+            updates = [
+                query["sql"]
+                for query in queries.captured_queries
+                if query["sql"].startswith('UPDATE "post_post"')
+            ]
+            self.assertEqual(len(updates), expected)
+            self.assertEqual(invalidate.call_count, expected + 1)
+
+        liked_post.refresh_from_db()
+        self.assertEqual(liked_post.like_count, 0)
+
+    def test_list_posts_query_count_does_not_grow_with_rows(self):
+        for _ in range(5):
+            post = sample_post(author=self.user)
+            Like.objects.create(user=self.user, post=post)
+
+        with self.assertNumQueries(3):
+            self.client.get(POST_URL)
+
+    def test_rebuild_post_counters_command(self):
+        post = sample_post(author=self.user)
+        Like.objects.create(user=self.user, post=post)
+        Post.objects.filter(pk=post.pk).update(like_count=10)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_post_counters", "--check", stdout=StringIO())
+
+        call_command("rebuild_post_counters", stdout=StringIO())
+        post.refresh_from_db()
+
+        self.assertEqual(post.like_count, 1)
+
+
+class HomeTimelineTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@gmail.com",
+            username="username",
+            password="secret_password",
+        )
+        self.author = get_user_model().objects.create_user(
+            email="author@gmail.com",
+            username="author",
+            password="secret_password",
+        )
+        self.client.force_authenticate(self.user)
+
+    def feed_ids(self):
+        return [post["id"] for post in self.client.get(POST_URL).data["results"]]
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        self.user.following.add(self.author)
+        post = sample_post(author=self.author)
+
+        self.assertEqual(self.feed_ids(), [post.id])
+
+    def test_follow_backfills_and_unfollow_trims_timeline(self):
+        post = sample_post(author=self.author)
+
+        self.client.post(reverse("user:follow-unfollow", args=[self.author.id]))
+        self.assertEqual(self.feed_ids(), [post.id])
+
+        self.client.post(reverse("user:follow-unfollow", args=[self.author.id]))
+        self.assertEqual(self.feed_ids(), [])
+
+    @override_settings(TIMELINE_FAN_OUT_THRESHOLD=1)
+    def test_posts_of_popular_authors_are_merged_on_read(self):
+        self.user.following.add(self.author)
+        self.author.refresh_from_db()
+        post = sample_post(author=self.author)
+        own_post = sample_post(author=self.user)
+
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user, post=post))
+        self.assertEqual(self.feed_ids(), [own_post.id, post.id])
+
+    @override_settings(TIMELINE_FAN_OUT_THRESHOLD=2)
+    def test_posts_are_fanned_out_when_author_drops_below_threshold(self):
+        fans = [
+            get_user_model().objects.create_user(
+                email=f"fan{i}@gmail.com", username=f"fan{i}", password="secret"
+            )
+            for i in range(2)
+        ]
+        self.author.followers.add(self.user, *fans)
+        self.author.refresh_from_db()
+        post = sample_post(author=self.author)
+
+        fans[0].following.remove(self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=post).exclude(user=self.author)
+        )
+
+        self.author.followers.remove(fans[1])
+        self.assertEqual(self.feed_ids(), [post.id])
+        self.assertFalse(TimelineEntry.objects.filter(user__in=fans, post=post))
+
+    @override_settings(TIMELINE_FAN_OUT_THRESHOLD=2)
+    def test_deleting_a_follower_fans_out_posts_of_author(self):
+        fan = get_user_model().objects.create_user(
+            email="fan@gmail.com", username="fan", password="secret"
+        )
+        self.author.followers.add(self.user, fan)
+        self.author.refresh_from_db()
+        post = sample_post(author=self.author)
+
+        fan.delete()
+
+        self.assertEqual(self.feed_ids(), [post.id])
+
+    def test_rebuild_timelines_after_raw_inserts(self):
+        self.user.following.add(self.author)
+        post = sample_post(author=self.author)
+        own_post = sample_post(author=self.user)
+        TimelineEntry.objects.all().delete()
+
+        call_command("rebuild_timelines", stdout=StringIO())
+
+        self.assertEqual(self.feed_ids(), [own_post.id, post.id])
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.feed_ids(), [post.id])
+
+    def test_retrieve_own_post_with_several_followers(self):
+        self.author.following.add(self.user)
+        get_user_model().objects.create_user(
+            email="fan@gmail.com", username="fan", password="secret_password"
+        ).following.add(self.user)
+        post = sample_post(author=self.user)
+
+        response = self.client.get(detail_url(post.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class PostFeedPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@gmail.com",
+            username="username",
+            password="secret_password",
+        )
+        self.client.force_authenticate(self.user)
+        self.posts = [sample_post(author=self.user) for _ in range(5)]
+        Post.objects.update(created_at=self.posts[0].created_at)
+        TimelineEntry.objects.update(created_at=self.posts[0].created_at)
+
+    def test_cursor_walks_feed_forward_and_back_without_offset(self):
+        url = f"{POST_URL}?page_size=2"
+        seen = []
+
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                response = self.client.get(url)
+                seen.extend(post["id"] for post in response.data["results"])
+                last_page = response.data
+                url = response.data["next"]
+
+        self.assertEqual(seen, sorted((post.id for post in self.posts), reverse=True))
+        for query in queries.captured_queries:
+            self.assertNotIn("OFFSET", query["sql"])
+            self.assertNotIn("COUNT(*)", query["sql"])
+
+        previous = self.client.get(last_page["previous"])
+        self.assertEqual([post["id"] for post in previous.data["results"]], seen[2:4])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(POST_URL, {"cursor": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_out_of_range_position(self):
+        position = json.dumps([str(self.posts[0].created_at), "9" * 20])
+        cursor = b64encode(urlencode({"p": position}).encode()).decode()
+
+        for url in (POST_URL, reverse("post:async-post-list")):
+            response = self.client.get(url, {"cursor": cursor})
+
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@gmail.com",
+            username="username",
+            password="secret_password",
+        )
+        self.client.force_authenticate(self.user)
+        self.post = sample_post(author=self.user, content="Long content")
+        self.post.tags.add(sample_tag(name="tag"))
+
+    def test_fields_narrow_feed_rows_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(POST_URL, {"fields": "id,title,likes"})
+
+        self.assertEqual(
+            response.data["results"],
+            [{"id": self.post.id, "title": "Post", "likes": 0}],
+        )
+        sql = "\n".join(query["sql"] for query in queries.captured_queries)
+        self.assertNotIn('"content"', sql)
+        self.assertNotIn("post_post_tags", sql)
+        self.assertNotIn('"username"', sql)
+
+    def test_expanded_author_matches_post_list_serializer(self):
+        request = Request(APIRequestFactory().get(POST_URL, {"expand": "author"}))
+        context = {"request": request, "format": None}
+        fieldset = Fieldset(request, PostFeedSerializer)
+        rows = Post.objects.values(*PostFeedSerializer.values(fieldset))
+        posts = Post.objects.select_related("author").prefetch_related("tags")
+
+        data = PostFeedSerializer(rows, many=True, context=context).data
+
+        self.assertEqual(
+            data[0]["author"],
+            {"id": self.user.id, "username": "username", "picture": None},
+        )
+        self.assertEqual(
+            JSONRenderer().render(data),
+            JSONRenderer().render(
+                PostListSerializer(posts, many=True, context=context).data
+            ),
+        )
+
+    def test_detail_is_cached_per_fieldset(self):
+        url = detail_url(self.post.id)
+
+        full = self.client.get(url)
+        narrow = self.client.get(url, {"fields": "id,recent_likes"})
+        expanded = self.client.get(url, {"fields": "id", "expand": "author"})
+
+        self.assertIn("content", full.data)
+        self.assertEqual(narrow.data, {"id": self.post.id, "recent_likes": []})
+        self.assertEqual(
+            expanded.data,
+            {
+                "id": self.post.id,
+                "author": {"id": self.user.id, "username": "username", "picture": None},
+            },
+        )
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(POST_URL, {"fields": "id,secret", "expand": "tags"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("fields", response.data)
+        self.assertIn("expand", response.data)
+
+
+class PostBatchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@gmail.com",
+            username="username",
+            password="secret_password",
+        )
+        self.client.force_authenticate(self.user)
+        self.stranger = get_user_model().objects.create_user(
+            email="stranger@gmail.com",
+            username="stranger",
+            password="secret_password",
+        )
+        self.url = reverse("post:post-batch")
+
+    def test_batch_is_keyed_by_id_with_visible_posts_only(self):
+        posts = [sample_post(author=self.user, title=f"Post {i}") for i in range(3)]
+        for post in posts:
+            post.tags.add(sample_tag(name=post.title))
+        hidden = sample_post(author=self.stranger)
+        ids = [posts[2].id, hidden.id, posts[0].id, 1000, posts[1].id]
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"ids": ",".join(map(str, ids))})
+
+        results = response.data["results"]
+        self.assertEqual(list(results), [str(pk) for pk in ids])
+        self.assertIsNone(results[str(hidden.id)])
+        self.assertIsNone(results["1000"])
+        request = Request(APIRequestFactory().get(self.url))
+        for post in posts:
+            self.assertEqual(
+                results[str(post.id)],
+                PostListSerializer(post, context={"request": request}).data,
+            )
+
+    def test_batch_respects_fieldset(self):
+        post = sample_post(author=self.user)
+
+        response = self.client.get(self.url, {"ids": post.id, "fields": "id,title"})
+
+        self.assertEqual(
+            response.data["results"], {str(post.id): {"id": post.id, "title": "Post"}}
+        )
+
+    @override_settings(BATCH_MAX_IDS=2)
+    def test_invalid_ids_are_rejected(self):
+        for ids in ("", "1,a", "1,2,3", "1,-2", "0", f"1,{2**63}"):
+            response = self.client.get(self.url, {"ids": ids})
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("ids", response.data)
+
+
+class LikeApiTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@gmail.com",
+            username="username",
+            password="secret_password",
+        )
+        self.client.force_authenticate(self.user)
+        self.post = sample_post(author=self.user)
+        self.url = reverse("post:like-unlike", args=[self.post.id])
+
+    def test_put_like_is_idempotent(self):
+        self.client.put(self.url)
+        response = self.client.put(self.url)
+        self.post.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 1)
+        self.assertEqual(self.post.like_count, 1)
+
+    def test_delete_like_is_idempotent(self):
+        Like.objects.create(user=self.user, post=self.post)
+
+        self.client.delete(self.url)
+        response = self.client.delete(self.url)
+        self.post.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Like.objects.filter(post=self.post).exists())
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_duplicate_like_is_rejected(self):
+        Like.objects.create(user=self.user, post=self.post)
+
+        with self.assertRaises(IntegrityError):
+            Like.objects.create(user=self.user, post=self.post)
+
+    def test_like_unknown_post(self):
+        url = reverse("post:like-unlike", args=[self.post.id + 1])
+
+        response = self.client.post(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(LIKE_WRITE_BEHIND=True, LIKE_WRITE_BEHIND_INTERVAL=0)
+class WriteBehindLikeTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@gmail.com",
+            username="username",
+            password="secret_password",
+        )
+        self.client.force_authenticate(self.user)
+        self.post = sample_post(author=self.user)
+        self.url = reverse("post:like-unlike", args=[self.post.id])
+        self.addCleanup(like_buffer.clear)
+
+    def test_buffered_like_is_visible_before_flush(self):
+        response = self.client.post(self.url)
+
+        self.assertEqual(response.data["detail"], "You liked this post")
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(self.client.get(POST_URL).data["results"][0]["likes"], 1)
+        liked_posts = self.client.get(reverse("post:liked-posts")).data["results"]
+        self.assertEqual([post["id"] for post in liked_posts], [self.post.id])
+
+    def test_flush_writes_likes_and_counters(self):
+        self.client.post(self.url)
+
+        self.assertEqual(like_buffer.flush(), 1)
+        self.post.refresh_from_db()
+
+        self.assertTrue(Like.objects.filter(user=self.user, post=self.post).exists())
+        self.assertEqual(self.post.like_count, 1)
+
+        self.client.delete(self.url)
+        like_buffer.flush()
+        self.post.refresh_from_db()
+
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_intents_are_coalesced(self):
+        self.client.post(self.url)
+        self.client.post(self.url)
+        self.client.put(self.url)
+        self.client.delete(self.url)
+
+        self.assertEqual(like_buffer.flush(), 0)
+        self.assertFalse(Like.objects.exists())
+
+    def test_pending_delta_follows_intents(self):
+        other = get_user_model().objects.create_user(
+            email="other@gmail.com", username="other", password="secret_password"
+        )
+        like_buffer.toggle(self.user.id, self.post.id)
+        like_buffer.toggle(other.id, self.post.id)
+        like_buffer.set_liked(other.id, self.post.id, False)
+
+        self.assertEqual(like_buffer.pending_delta(self.post.id), 1)
+
+        with mock.patch.object(like_buffer, "_write", side_effect=DatabaseError):
+            with self.assertLogs("post.like_buffer", "ERROR"):
+                like_buffer.flush()
+        self.assertEqual(like_buffer.pending_delta(self.post.id), 1)
+
+        like_buffer.flush()
+        self.assertEqual(like_buffer.pending_delta(self.post.id), 0)
+
+    def test_intents_stay_visible_while_flushing(self):
+        self.client.post(self.url)
+        write = like_buffer._write
+        seen = []
+
+        def write_after_requests(changes):
+            seen.append(like_buffer.pending_delta(self.post.id))
+            seen.append(like_buffer.pending_for_user(self.user.id))
+            seen.append(self.client.get(reverse("post:liked-posts")).data["results"])
+            write(changes)
+
+        with mock.patch.object(like_buffer, "_write", write_after_requests):
+            like_buffer.flush()
+
+        self.assertEqual(seen[0], 1)
+        self.assertEqual(seen[1], ({self.post.id}, set()))
+        self.assertEqual([post["id"] for post in seen[2]], [self.post.id])
+        self.assertEqual(like_buffer.pending_delta(self.post.id), 0)
+        self.assertEqual(like_buffer.pending_for_user(self.user.id), (set(), set()))
+
+
+class PostSubresourceTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@gmail.com",
+            username="username",
+            password="secret_password",
+        )
+        self.client.force_authenticate(self.user)
+        self.post = sample_post(author=self.user)
+
+    def test_list_post_comments(self):
+        for index in range(4):
+            Comment.objects.create(post=self.post, user=self.user, text=f"{index}")
+        url = reverse("post:post-comments", args=[self.post.id])
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {"page_size": 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [comment["text"] for comment in response.data["results"]],
+            ["3", "2", "1"],
+        )
+        self.assertEqual(response.data["results"][0]["user"], self.user.username)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_list_post_likes(self):
+        Like.objects.create(post=self.post, user=self.user)
+        url = reverse("post:post-likes", args=[self.post.id])
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["user"], self.user.username)
+
+    def test_list_comments_of_invisible_post(self):
+        stranger = get_user_model().objects.create_user(
+            email="stranger@gmail.com", username="stranger", password="password"
+        )
+        post = sample_post(author=stranger)
+        url = reverse("post:post-comments", args=[post.id])
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_detail_contains_counts_and_recent_items(self):
+        for index in range(5):
+            Comment.objects.create(post=self.post, user=self.user, text=f"{index}")
+
+        response = self.client.get(detail_url(self.post.id))
+
+        self.assertEqual(response.data["comments"], 5)
+        self.assertEqual(
+            len(response.data["recent_comments"]), PostDetailSerializer.recent_items
+        )
+
+
+class PostDetailCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@gmail.com",
+            username="username",
+            password="secret_password",
+        )
+        self.client.force_authenticate(self.user)
+        self.post = sample_post(author=self.user)
+        self.url = detail_url(self.post.id)
+
+    def test_cached_detail_only_checks_visibility(self):
+        self.client.get(self.url)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], self.post.id)
+
+    def test_comment_invalidates_cached_detail(self):
+        self.client.get(self.url)
+
+        self.client.post(reverse("post:comment", args=[self.post.id]), {"text": "Hi"})
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.data["comments"], 1)
+
+    def test_update_invalidates_cached_detail(self):
+        self.client.get(self.url)
+
+        self.client.patch(self.url, {"title": "New title"})
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.data["title"], "New title")
+
+    def test_concurrent_miss_waits_for_single_rebuild(self):
+        builds = []
+
+        def build():
+            builds.append(True)
+            time.sleep(0.1)
+            return {"id": self.post.id}
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(
+                executor.map(
+                    lambda _: post_detail_cache.get_or_build(self.post.id, "", build),
+                    range(4),
+                )
+            )
+
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(results, [{"id": self.post.id}] * 4)
+
+
+class AsyncPostApiTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@gmail.com",
+            username="username",
+            password="secret_password",
+        )
+        self.client.force_authenticate(self.user)
+        self.post = sample_post(author=self.user)
+        self.post.tags.add(sample_tag())
+        Like.objects.create(user=self.user, post=self.post)
+
+    def test_async_views_match_sync_views(self):
+        for sync_url, async_url in [
+            (POST_URL, reverse("post:async-post-list")),
+            (
+                detail_url(self.post.id),
+                reverse("post:async-post-detail", args=[self.post.id]),
+            ),
+            (reverse("post:liked-posts"), reverse("post:async-liked-posts")),
+        ]:
+            response = self.client.get(async_url)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json(), self.client.get(sync_url).json())
+
+    def test_async_detail_of_invisible_post(self):
+        stranger = get_user_model().objects.create_user(
+            email="stranger@gmail.com", username="stranger", password="password"
+        )
+        post = sample_post(author=stranger)
+
+        response = self.client.get(reverse("post:async-post-detail", args=[post.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_async_views_require_authentication(self):
+        self.client.force_authenticate(None)
+
+        response = self.client.get(reverse("post:async-post-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", response)
+
+
+@override_settings(IMAGE_PROCESSING_WORKERS=0)
+class PostPictureTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            email="user@gmail.com",
+            username="username",
+            password="secret_password",
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_post(self):
+        picture = SimpleUploadedFile("picture.jpg", sample_image(), "image/jpeg")
+        response = self.client.post(
+            POST_URL,
+            {"title": "Post", "content": "Content", "picture": picture},
+            format="multipart",
+        )
+        return Post.objects.get(pk=response.data["id"])
+
+    def test_original_is_served_until_variants_are_ready(self):
+        post = self.create_post()
+
+        response = self.client.get(detail_url(post.id))
+
+        self.assertEqual(post.picture_variants, {})
+        self.assertTrue(response.data["picture"].endswith(post.picture.url))
+        self.assertEqual(response.data["picture_variants"], {})
+
+    def test_variants_are_rendered_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = self.create_post()
+
+        post.refresh_from_db()
+        variants = post.picture_variants
+        self.assertEqual(variants["source"], post.picture.name)
+        self.assertEqual(
+            {
+                name: (variants[name]["width"], variants[name]["height"])
+                for name in ("thumbnail", "feed", "full")
+            },
+            {"thumbnail": (160, 80), "feed": (720, 360), "full": (1600, 800)},
+        )
+
+        list_response = self.client.get(POST_URL)
+        detail_response = self.client.get(detail_url(post.id))
+
+        self.assertTrue(
+            list_response.data["results"][0]["picture"].endswith("-feed.webp")
+        )
+        self.assertTrue(detail_response.data["picture"].endswith("-full.webp"))
+        self.assertTrue(
+            detail_response.data["picture_variants"]["thumbnail"]["jpeg_url"].endswith(
+                "-thumbnail.jpeg"
+            )
+        )
+
+    def test_feed_serializer_matches_post_list_serializer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_post()
+            self.create_post()
+        post = sample_post(author=self.user, title="Без картинки")
+        first, second = sample_tag(name="first"), sample_tag(name="second")
+        post.tags.add(second, first)
+        Like.objects.create(user=self.user, post=post)
+
+        request = Request(APIRequestFactory().get(POST_URL))
+        context = {"request": request, "format": None}
+        posts = Post.objects.select_related("author").prefetch_related("tags")
+        rows = Post.objects.values(
+            *PostFeedSerializer.values(Fieldset(request, PostFeedSerializer))
+        )
+
+        self.assertEqual(
+            JSONRenderer().render(
+                PostFeedSerializer(rows, many=True, context=context).data
+            ),
+            JSONRenderer().render(
+                PostListSerializer(posts, many=True, context=context).data
+            ),
+        )
+
+    def test_removed_picture_clears_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = self.create_post()
+
+        post.refresh_from_db()
+        post.picture = None
+        post.save()
+
+        post.refresh_from_db()
+        self.assertEqual(post.picture_variants, {})
+
+    def test_render_variants_strips_metadata_and_keeps_aspect_ratio(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        data = sample_image(size=(1200, 900), exif=exif)
+
+        variants = render_variants(data, {"small": 100, "large": 4000}, 80)
+
+        self.assertEqual(
+            (variants["small"]["width"], variants["small"]["height"]), (75, 100)
+        )
+        self.assertEqual(
+            (variants["large"]["width"], variants["large"]["height"]), (900, 1200)
+        )
+        for content in variants["small"]["files"].values():
+            self.assertEqual(dict(Image.open(BytesIO(content)).getexif()), {})
+
+
+class MediaServingTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.name = "uploads/posts/post-0b7c5a4e-1f7e-4a52-8a1e-3c2f0e8f9d10.jpg"
+        self.content = sample_image()
+        os.makedirs(os.path.join(media_root, "uploads/posts"))
+        with open(os.path.join(media_root, self.name), "wb") as file:
+            file.write(self.content)
+        self.url = f"/media/{self.name}"
+
+    def test_serves_file_with_etag_and_immutable_caching(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertTrue(response["ETag"].startswith('"'))
+
+    def test_conditional_requests(self):
+        response = self.client.get(self.url)
+
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        not_modified_since = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"')
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+        self.assertEqual(not_modified_since.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+
+    def test_range_requests(self):
+        size = len(self.content)
+
+        first = self.client.get(self.url, HTTP_RANGE="bytes=0-9")
+        suffix = self.client.get(self.url, HTTP_RANGE="bytes=-5")
+        unsatisfiable = self.client.get(self.url, HTTP_RANGE=f"bytes={size}-")
+        stale = self.client.get(
+            self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"other"'
+        )
+
+        self.assertEqual(first.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(first["Content-Range"], f"bytes 0-9/{size}")
+        self.assertEqual(first["Content-Length"], "10")
+        self.assertEqual(b"".join(first.streaming_content), self.content[:10])
+        self.assertEqual(b"".join(suffix.streaming_content), self.content[-5:])
+        self.assertEqual(
+            unsatisfiable.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(unsatisfiable["Content-Range"], f"bytes */{size}")
+        self.assertEqual(stale.status_code, status.HTTP_200_OK)
+
+    def test_files_outside_media_root_are_not_served(self):
+        response = self.client.get("/media/%2E%2E/manage.py")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(
+        MEDIA_SENDFILE_HEADER="X-Accel-Redirect",
+        MEDIA_ACCEL_REDIRECT_PREFIX="/protected/",
+    )
+    def test_hands_off_to_front_proxy(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected/{self.name}")
+        self.assertEqual(response.content, b"")
+
+    @override_settings(MEDIA_SENDFILE_HEADER="X-Accel-Redirect")
+    def test_front_proxy_location_is_percent_encoded(self):
+        name = "profile_pictures/фото 1.jpg"
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, "profile_pictures"))
+        with open(os.path.join(settings.MEDIA_ROOT, name), "wb") as file:
+            file.write(self.content)
+
+        response = self.client.get(f"/media/{name}")
+
+        self.assertEqual(
+            response["X-Accel-Redirect"],
+            "/protected-media/profile_pictures/%D1%84%D0%BE%D1%82%D0%BE%201.jpg",
+        )
+
+
+def server_timing(response):
+    metrics = {}
+    for metric in response["Server-Timing"].split(", "):
+        name, *params = metric.split(";")
+        metrics[name] = dict(param.split("=", 1) for param in params)
+    return metrics
+
+
+class ServerTimingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@gmail.com", username="username", password="secret_password"
+        )
+        self.client.force_authenticate(self.user)
+        sample_post(author=self.user)
+
+    def test_reports_phases_of_request(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(POST_URL)
+
+        metrics = server_timing(response)
+        self.assertEqual(set(metrics), {"db", "checks", "serialize", "render", "total"})
+        self.assertEqual(metrics["db"]["desc"], f'"{len(queries)} queries"')
+        for params in metrics.values():
+            self.assertGreaterEqual(float(params["dur"]), 0)
+
+    def test_reports_phases_of_async_request(self):
+        response = self.client.get(reverse("post:async-post-list"))
+
+        self.assertEqual(
+            set(server_timing(response)),
+            {"db", "checks", "serialize", "render", "total"},
+        )
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_disabled(self):
+        response = self.client.get(POST_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Server-Timing", response)
+
+    def test_drf_classes_are_left_unpatched(self):
+        self.client.get(POST_URL)
+
+        self.assertEqual(APIView.initial.__qualname__, "APIView.initial")
+        self.assertEqual(BaseSerializer.data.fget.__qualname__, "BaseSerializer.data")
+
+    @override_settings(SERVER_TIMING_SLOW_THRESHOLD=0, SERVER_TIMING_SLOW_REQUESTS=1)
+    def test_logs_slowest_requests_with_queries(self):
+        with self.assertLogs("social_media_api.timing", "WARNING") as logs:
+            self.client.get(POST_URL)
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn(f"Slow request GET {POST_URL}", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = get_user_model().objects.create_user(
+            email="admin@gmail.com",
+            username="admin",
+            password="secret_password",
+            is_staff=True,
+        )
+        self.client.force_authenticate(self.admin)
+        self.post = sample_post(author=self.admin)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_labelled_by_view_and_action(self):
+        requests = self.sample(
+            "http_requests_total", view="PostViewSet.list", status="200"
+        )
+        latencies = self.sample(
+            "http_request_duration_seconds_count", view="PostViewSet.list"
+        )
+        queries = self.sample("http_request_db_queries_sum", view="PostViewSet.list")
+
+        self.client.post(reverse("post:like-unlike", args=[self.post.id]))
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(POST_URL)
+
+        self.assertEqual(
+            self.sample("http_requests_total", view="PostViewSet.list", status="200"),
+            requests + 1,
+        )
+        self.assertEqual(
+            self.sample("http_request_duration_seconds_count", view="PostViewSet.list"),
+            latencies + 1,
+        )
+        self.assertEqual(
+            self.sample("http_request_db_queries_sum", view="PostViewSet.list"),
+            queries + len(captured),
+        )
+        self.assertGreater(
+            self.sample(
+                "http_requests_total", view="LikeUnlikePost.post", status="200"
+            ),
+            0,
+        )
+
+    def test_post_detail_cache_lookups(self):
+        misses = self.sample("cache_lookups_total", cache="post-detail", result="miss")
+        hits = self.sample("cache_lookups_total", cache="post-detail", result="hit")
+
+        self.client.get(detail_url(self.post.id))
+        self.client.get(detail_url(self.post.id))
+
+        self.assertEqual(
+            self.sample("cache_lookups_total", cache="post-detail", result="miss"),
+            misses + 1,
+        )
+        self.assertEqual(
+            self.sample("cache_lookups_total", cache="post-detail", result="hit"),
+            hits + 1,
+        )
+
+    def test_exposition(self):
+        self.client.get(POST_URL)
+
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(
+            'http_request_duration_seconds_bucket{le="0.005",view="PostViewSet.list"}',
+            response.content.decode(),
+        )
+
+    def test_exposition_requires_admin(self):
+        self.admin.is_staff = False
+        self.admin.save()
+
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class QueryPlanTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@gmail.com", username="username", password="secret_password"
+        )
+        for index in range(3):
+            other = get_user_model().objects.create_user(
+                email=f"user{index}@gmail.com",
+                username=f"user{index}",
+                password="secret_password",
+            )
+            self.user.follow(other)
+            other.follow(self.user)
+            post = sample_post(author=other, title=f"Post {index}")
+            post.tags.add(sample_tag(name=f"tag{index}"))
+            Like.objects.create(user=self.user, post=post)
+            Comment.objects.create(user=other, post=post, text="Comment")
+
+    def test_routes_have_no_unexpected_query_plan_problems(self):
+        self.assertEqual([str(problem) for problem in self.check()], [])
+
+    def test_routes_use_a_post_visible_to_the_user(self):
+        self.user.unfollow(get_user_model().objects.get(username="user0"))
+
+        self.assertEqual([str(problem) for problem in self.check()], [])
+
+    @override_settings(QUERY_PLAN_ALLOWED_PROBLEMS={})
+    def test_reports_full_scans_and_temp_b_trees(self):
+        problems = {
+            (problem.route.split()[-1], problem.kind, problem.detail)
+            for problem in self.check()
+        }
+
+        self.assertIn(("(post:post-list)", "full scan", "post_tag"), problems)
+        self.assertIn(("(user:followers)", "temp b-tree", "for ORDER BY"), problems)
+        self.assertIn(("(post:export)", "client error", "403"), problems)
+
+    @override_settings(QUERY_PLAN_BUDGET=1)
+    def test_reports_requests_over_query_budget(self):
+        problems = [
+            problem for problem in self.check() if problem.kind == "query budget"
+        ]
+
+        self.assertIn(
+            "(post:post-list)", [problem.route.split()[-1] for problem in problems]
+        )
+
+    def test_plan_problems_resolve_table_aliases(self):
+        sql = 'SELECT 1 FROM "post_post" WHERE "id" IN (SELECT U0."id" FROM "post_tag" U0)'
+
+        self.assertEqual(
+            plan_problems(
+                sql,
+                [
+                    "SCAN U0",
+                    "SEARCH post_post USING INTEGER PRIMARY KEY (rowid=?)",
+                    "USE TEMP B-TREE FOR ORDER BY",
+                ],
+            ),
+            [("full scan", "post_tag"), ("temp b-tree", "for ORDER BY")],
+        )
+
+    def check(self):
+        return QueryPlanGuard(self.user).check()
+
+
+class ImportFixtureTests(APITransactionTestCase):
+    fixture_path = settings.BASE_DIR / "fixture_data.json"
+
+    def assert_fixture_imported(self):
+        User = get_user_model()
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Post.tags.through.objects.count(), 4)
+        self.assertTrue(User.following.through.objects.exists())
+        self.assertEqual(
+            Post.objects.get(pk=1).created_at.isoformat(),
+            "2023-10-27T09:11:28.171000+00:00",
+        )
+        for post in Post.objects.all():
+            self.assertEqual(post.like_count, post.likes.count())
+            self.assertEqual(post.comment_count, post.comments.count())
+            self.assertTrue(
+                TimelineEntry.objects.filter(user=post.author, post=post).exists()
+            )
+        for user in User.objects.all():
+            self.assertEqual(user.follower_count, user.followers.count())
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Post._meta.db_table
+            )
+        self.assertIn("post_created_idx", constraints)
+
+    def test_import_json_fixture(self):
+        stdout = StringIO()
+
+        call_command("import_fixture", str(self.fixture_path), stdout=stdout)
+
+        self.assert_fixture_imported()
+        self.assertIn("rows/s", stdout.getvalue())
+
+    def test_import_ndjson_fixture(self):
+        with open(self.fixture_path) as file:
+            objects = json.load(file)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "fixture.ndjson")
+        with open(path, "w") as file:
+            file.writelines(json.dumps(obj) + "\n" for obj in objects)
+
+        call_command("import_fixture", path, batch_size=2, stdout=StringIO())
+
+        self.assert_fixture_imported()
+
+    def test_invalid_fixture(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "fixture.json")
+        with open(path, "w") as file:
+            file.write('[{"model": "post.tag", "pk": 1, "fields": {"name": "a"}}')
+
+        with self.assertRaises(CommandError):
+            call_command("import_fixture", path, stdout=StringIO())
+
+        self.assertFalse(Tag.objects.exists())
+
+    def test_iter_json_array_across_chunks(self):
+        objects = [{"text": "a, ] } [ {"}, {"nested": {"list": [1, 2]}}, {}]
+
+        items = list(iter_json_array(StringIO(json.dumps(objects)), chunk_size=3))
+
+        self.assertEqual(items, objects)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_user(
+            email="admin@gmail.com",
+            username="admin",
+            password="secret_password",
+            is_staff=True,
+        )
+        self.user = get_user_model().objects.create_user(
+            email="user@gmail.com", username="username", password="secret_password"
+        )
+        self.user.follow(self.admin)
+        self.post = sample_post(author=self.user)
+        self.post.tags.add(sample_tag())
+        Comment.objects.create(user=self.admin, post=self.post, text="Comment")
+        Like.objects.create(user=self.admin, post=self.post)
+        self.client.force_authenticate(self.admin)
+
+    def export(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command("export_ndjson", *args, stdout=stdout, stderr=stderr)
+        watermark = stderr.getvalue().strip().removeprefix("Watermark: ")
+        return [json.loads(line) for line in stdout.getvalue().splitlines()], watermark
+
+    def test_export_all_content(self):
+        rows, _ = self.export()
+
+        self.assertEqual(
+            [row["model"] for row in rows],
+            [
+                "post.tag",
+                "post.post",
+                "post.comment",
+                "post.like",
+                "user.user_following",
+            ],
+        )
+        self.assertEqual(rows[1]["fields"]["tags"], [self.post.tags.get().id])
+        self.assertEqual(
+            rows[4]["fields"], {"from_user": self.user.id, "to_user": self.admin.id}
+        )
+
+    def test_incremental_export(self):
+        _, watermark = self.export()
+        post = sample_post(author=self.admin)
+
+        rows, _ = self.export("--since", watermark)
+
+        self.assertEqual(
+            [(row["model"], row["pk"]) for row in rows], [("post.post", post.id)]
+        )
+
+    def test_gzip_export_to_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "export.ndjson.gz")
+
+        call_command("export_ndjson", "--gzip", "-o", path, stderr=StringIO())
+
+        with gzip.open(path, "rt") as file:
+            self.assertEqual(len(file.readlines()), 5)
+
+    def test_export_endpoint(self):
+        url = reverse("post:export")
+
+        response = self.client.get(url)
+        compressed = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        incremental = self.client.get(url, {"since": response["X-Export-Watermark"]})
+
+        content = b"".join(response.streaming_content)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(len(content.splitlines()), 5)
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertEqual(
+            gzip.decompress(b"".join(compressed.streaming_content)), content
+        )
+        self.assertEqual(b"".join(incremental.streaming_content), b"")
+
+    def test_export_endpoint_requires_admin(self):
+        self.client.force_authenticate(self.user)
+
+        response = self.client.get(reverse("post:export"))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_watermark(self):
+        response = self.client.get(reverse("post:export"), {"since": "post.post:x"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], READ_YOUR_WRITES_WINDOW=60)
+class ReplicaRoutingTests(APITransactionTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.author = get_user_model().objects.create_user(
+            email="author@gmail.com", username="author", password="secret_password"
+        )
+        self.reader = get_user_model().objects.create_user(
+            email="reader@gmail.com", username="reader", password="secret_password"
+        )
+        self.reader.follow(self.author)
+        sample_post(author=self.author, title="Replicated")
+        call_command("sync_replica", stdout=StringIO())
+
+    def feed_titles(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get(POST_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post["title"] for post in response.data["results"]]
+
+    def test_reads_from_replica_and_writers_stick_to_primary(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.post(POST_URL, {"title": "New", "content": "Content"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(self.feed_titles(self.author), ["New", "Replicated"])
+        self.assertEqual(self.feed_titles(self.reader), ["Replicated"])
+        self.assertEqual(Post.objects.count(), 2)
+
+        call_command("sync_replica", stdout=StringIO())
+
+        self.assertEqual(self.feed_titles(self.reader), ["New", "Replicated"])
+
+    @override_settings(READ_YOUR_WRITES_WINDOW=0)
+    def test_stickiness_expires(self):
+        self.client.force_authenticate(self.author)
+        self.client.post(POST_URL, {"title": "New", "content": "Content"})
+
+        self.assertEqual(self.feed_titles(self.author), ["Replicated"])
+
+    @override_settings(DATABASE_REPLICAS=["replica", "other-replica"])
+    def test_request_reads_from_a_single_replica(self):
+        request = APIRequestFactory().get(POST_URL)
+        request.user = self.reader
+        routing = ReadRouting(request)
+
+        with mock.patch("random.choice", side_effect=["replica", "other-replica"]):
+            databases = {routing.database() for _ in range(5)}
+
+        self.assertEqual(databases, {"replica"})
+
+
+class SocialGraphBenchmarkTests(APITransactionTestCase):
+    def setUp(self):
+        call_command(
+            "generate_social_graph",
+            users=60,
+            following=8,
+            tags=10,
+            posts=120,
+            likes=4,
+            comments=2,
+            batch_size=50,
+            stdout=StringIO(),
+        )
+
+    def test_generated_graph(self):
+        User = get_user_model()
+        follower_counts = sorted(
+            User.objects.values_list("follower_count", flat=True), reverse=True
+        )
+
+        self.assertEqual(User.objects.count(), 60)
+        self.assertEqual(Post.objects.count(), 120)
+        self.assertGreater(follower_counts[0], 3 * follower_counts[30])
+        for user in User.objects.all()[:10]:
+            self.assertEqual(user.follower_count, user.followers.count())
+        for post in Post.objects.all()[:10]:
+            self.assertEqual(post.like_count, post.likes.count())
+            self.assertEqual(
+                TimelineEntry.objects.filter(post=post).count(),
+                post.author.followers.count() + 1,
+            )
+
+    def test_benchmark_reports_every_endpoint(self):
+        comments = Comment.objects.count()
+        likes = set(Like.objects.values_list("user", "post"))
+        follows = set(
+            get_user_model().following.through.objects.values_list(
+                "from_user", "to_user"
+            )
+        )
+        stdout = StringIO()
+
+        call_command("benchmark_api", requests=4, warmup=1, json=True, stdout=stdout)
+
+        results = json.loads(stdout.getvalue())
+        self.assertIn("feed", [row["endpoint"] for row in results])
+        self.assertIn("follow_toggle", [row["endpoint"] for row in results])
+        for row in results:
+            self.assertEqual(row["errors"], 0, row["endpoint"])
+            self.assertEqual(row["requests"], 4)
+            self.assertGreater(row["queries"], 0)
+        self.assertEqual(Comment.objects.count(), comments)
+        self.assertEqual(set(Like.objects.values_list("user", "post")), likes)
+        self.assertEqual(
+            set(
+                get_user_model().following.through.objects.values_list(
+                    "from_user", "to_user"
+                )
+            ),
+            follows,
+        )
+
+    def test_benchmark_keeps_committed_writes(self):
+        comments = Comment.objects.count()
+
+        call_command(
+            "benchmark_api",
+            endpoint=["comment"],
+            requests=3,
+            warmup=0,
+            keep_writes=True,
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(Comment.objects.count(), comments + 3)
@@ -0,0 +1,153 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.constants import OnConflict
+
+from post.models import Post, TimelineEntry
+
+
+def uses_fan_out_on_write(author):
+    return author.follower_count < settings.TIMELINE_FAN_OUT_THRESHOLD
+
+
+def _fan_out_on_read_authors(user):
+    return user.following.filter(
+        follower_count__gte=settings.TIMELINE_FAN_OUT_THRESHOLD
+    ).values("pk")
+
+
+def _insert_entries(post, user_ids):
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, created_at=post.created_at)
+            for user_id in user_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_post(post):
+    _insert_entries(post, [post.author_id])
+
+    if not uses_fan_out_on_write(post.author):
+        return
+
+    batch_size = settings.TIMELINE_FAN_OUT_BATCH_SIZE
+    follower_ids = post.author.followers.values_list("pk", flat=True)
+    batch = []
+    for follower_id in follower_ids.iterator(chunk_size=batch_size):
+        batch.append(follower_id)
+        if len(batch) == batch_size:
+            _insert_entries(post, batch)
+            batch = []
+    if batch:
+        _insert_entries(post, batch)
+
+
+def _insert_entries_from(queryset):
+    """Insert timeline entries selected by queryset as (user, post, created_at)"""
+    fields = [
+        TimelineEntry._meta.get_field(name) for name in ("user", "post", "created_at")
+    ]
+    select_sql, params = queryset.query.sql_with_params()
+    sql = " ".join(
+        [
+            connection.ops.insert_statement(on_conflict=OnConflict.IGNORE),
+            connection.ops.quote_name(TimelineEntry._meta.db_table),
+            "(%s)" % ", ".join(connection.ops.quote_name(f.column) for f in fields),
+            select_sql,
+            connection.ops.on_conflict_suffix_sql(
+                fields, OnConflict.IGNORE, None, None
+            ),
+        ]
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def rebuild_timelines():
+    """Fan out all posts again, e.g. after rows were inserted without signals"""
+    Following = get_user_model().following.through
+
+    _insert_entries_from(
+        Post.objects.order_by().values_list("author", "pk", "created_at")
+    )
+    _insert_entries_from(
+        Following.objects.filter(
+            to_user__follower_count__lt=settings.TIMELINE_FAN_OUT_THRESHOLD,
+            to_user__posts__isnull=False,
+        )
+        .order_by()
+        .values_list("from_user", "to_user__posts", "to_user__posts__created_at")
+    )
+
+
+def backfill_timeline(user, author):
+    if not uses_fan_out_on_write(author):
+        return
+
+    posts = author.posts.order_by("-created_at", "-pk")[
+        : settings.TIMELINE_BACKFILL_SIZE
+    ]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user=user, post=post, created_at=post.created_at)
+            for post in posts.only("pk", "created_at")
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill_followers(author, removed):
+    """
+    Fan out recent posts of an author about to lose `removed` followers when
+    that takes them below the fan-out threshold, since their posts are no
+    longer merged into the feeds of the remaining followers on read
+    """
+    threshold = settings.TIMELINE_FAN_OUT_THRESHOLD
+    if not author.follower_count - removed < threshold <= author.follower_count:
+        return
+
+    posts = author.posts.order_by("-created_at", "-pk").values_list("pk", flat=True)
+    Following = get_user_model().following.through
+    _insert_entries_from(
+        Following.objects.filter(
+            to_user=author,
+            to_user__posts__in=list(posts[: settings.TIMELINE_BACKFILL_SIZE]),
+        )
+        .order_by()
+        .values_list("from_user", "to_user__posts", "to_user__posts__created_at")
+    )
+
+
+def trim_timeline(user, author):
+    TimelineEntry.objects.filter(user=user, post__author=author).delete()
+
+
+def home_timeline(user):
+    fan_out_on_read = _fan_out_on_read_authors(user)
+    if fan_out_on_read.exists():
+        return (
+            Post.objects.filter(
+                Q(pk__in=TimelineEntry.objects.filter(user=user).values("post"))
+                | Q(author__in=fan_out_on_read)
+            )
+            .annotate(feed_created_at=F("created_at"), feed_post_id=F("pk"))
+            .order_by("-feed_created_at", "-feed_post_id")
+        )
+
+    return (
+        Post.objects.filter(timeline_entries__user=user)
+        .annotate(
+            feed_created_at=F("timeline_entries__created_at"),
+            feed_post_id=F("timeline_entries__post"),
+        )
+        .order_by("-feed_created_at", "-feed_post_id")
+    )
+
+
+def visible_posts(user):
+    return Post.objects.filter(
+        Q(author=user) | Q(author__in=user.following.values("pk"))
+    )
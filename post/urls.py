@@ -1,7 +1,17 @@
 from django.urls import path, include
 from rest_framework import routers
 
-from post.views import PostViewSet, TagViewSet, LikeUnlikePost, CommentPost, LikedPosts
+from post.async_views import AsyncPostList, AsyncPostDetail, AsyncLikedPosts
+from post.views import (
+    PostViewSet,
+    TagViewSet,
+    LikeUnlikePost,
+    CommentPost,
+    LikedPosts,
+    PostComments,
+    PostLikes,
+    Export,
+)
 
 route = routers.DefaultRouter()
 route.register("posts", PostViewSet)
@@ -11,7 +21,13 @@ urlpatterns = [
     path("", include(route.urls)),
     path("posts/<int:pk>/like/", LikeUnlikePost.as_view(), name="like-unlike"),
     path("posts/<int:pk>/comment/", CommentPost.as_view(), name="comment"),
+    path("posts/<int:pk>/comments/", PostComments.as_view(), name="post-comments"),
+    path("posts/<int:pk>/likes/", PostLikes.as_view(), name="post-likes"),
     path("liked_posts/", LikedPosts.as_view(), name="liked-posts"),
+    path("export/", Export.as_view(), name="export"),
+    path("async/posts/", AsyncPostList.as_view(), name="async-post-list"),
+    path("async/posts/<int:pk>/", AsyncPostDetail.as_view(), name="async-post-detail"),
+    path("async/liked_posts/", AsyncLikedPosts.as_view(), name="async-liked-posts"),
 ]
 
 app_name = "post"
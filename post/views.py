@@ -1,20 +1,52 @@
+import re
+
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
+from django.http import StreamingHttpResponse
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter, extend_schema_view
-from rest_framework import viewsets, mixins, generics
-from rest_framework.permissions import IsAuthenticated
+from rest_framework import viewsets, mixins, generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from post.cache import post_detail_cache
+from post.export import (
+    current_watermark,
+    export_ndjson,
+    format_watermark,
+    gzip_chunks,
+    parse_watermark,
+)
+from post.like_buffer import like_buffer
 from post.models import Post, Tag, Like
 from post.serializers import (
     PostSerializer,
     TagSerializer,
     PostListSerializer,
     PostDetailSerializer,
+    PostFeedSerializer,
     CommentSerializer,
-    LikeSerializer,
+    CommentListSerializer,
+    LikeListSerializer,
+    POST_FIELD_COLUMNS,
 )
 from post.permissions import IsAuthorOrReadOnly
+from post.timeline import home_timeline, visible_posts
+from social_media_api.batch import BatchRetrieveMixin
+from social_media_api.fieldsets import FIELDSET_PARAMETERS, Fieldset, only_columns
+from social_media_api.timing import TimedViewMixin
+
+
+def feed_values(queryset, fieldset, ordering):
+    """Rows of PostFeedSerializer, with the columns keyset pagination reads"""
+    position = [order.lstrip("-") for order in ordering]
+    return queryset.values(
+        *dict.fromkeys([*PostFeedSerializer.values(fieldset), *position])
+    )
 
 
 @extend_schema_view(
@@ -22,7 +54,10 @@ from post.permissions import IsAuthorOrReadOnly
     create=extend_schema(description="Create new tag"),
 )
 class TagViewSet(
-    mixins.CreateModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet
+    TimedViewMixin,
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
 ):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -32,6 +67,7 @@ class TagViewSet(
     list=extend_schema(description="Display all posts by all users"),
     create=extend_schema(description="Create new post"),
     retrieve=extend_schema(description="Display post with comments and likes"),
+    batch=extend_schema(description="Display posts with specified ids"),
     update=extend_schema(
         description="Update post with the specified only if you are author"
     ),
@@ -42,31 +78,51 @@ class TagViewSet(
         description="Delete post with the specified only if you are author"
     ),
 )
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(TimedViewMixin, BatchRetrieveMixin, viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [IsAuthorOrReadOnly, IsAuthenticated]
+    cursor_ordering = ("-feed_created_at", "-feed_post_id")
 
     def get_queryset(self):
-        queryset = self.queryset
+        if self.action == "list":
+            queryset = home_timeline(self.request.user)
+        else:
+            queryset = visible_posts(self.request.user)
 
         tag = self.request.query_params.get("tag")
         if tag:
-            queryset = queryset.filter(tags__name__icontains=tag)
+            queryset = queryset.filter(
+                pk__in=Tag.objects.filter(name__icontains=tag).values("posts")
+            )
 
-        queryset = queryset.filter(
-            Q(author__followers=self.request.user) | Q(author=self.request.user)
-        )
+        if self.action == "list":
+            return feed_values(queryset, self.get_fieldset(), self.cursor_ordering)
+
+        if self.action in ("retrieve", "batch"):
+            fieldset = self.get_fieldset()
+            queryset = only_columns(queryset, fieldset.columns(POST_FIELD_COLUMNS))
+            if "tags" in fieldset:
+                queryset = queryset.prefetch_related("tags")
 
         return queryset
 
+    def get_fieldset(self):
+        return Fieldset(self.request, self.get_serializer_class())
+
+    def get_detail_cache_variant(self):
+        return f"{self.request.build_absolute_uri('/')}?{self.get_fieldset().key}"
+
     def get_serializer_class(self):
         if self.action == "list":
-            return PostListSerializer
+            return PostFeedSerializer
 
         if self.action == "retrieve":
             return PostDetailSerializer
 
+        if self.action == "batch":
+            return PostListSerializer
+
         return PostSerializer
 
     def perform_create(self, serializer):
@@ -79,26 +135,59 @@ class PostViewSet(viewsets.ModelViewSet):
                 description="Filter posts by tag",
                 required=False,
                 type=OpenApiTypes.STR,
-            )
-        ]
+            ),
+            *FIELDSET_PARAMETERS,
+        ],
+        responses=PostListSerializer(many=True),
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    @extend_schema(parameters=FIELDSET_PARAMETERS)
+    def retrieve(self, request, *args, **kwargs):
+        post_id = get_object_or_404(
+            self.get_queryset().prefetch_related(None).values_list("pk", flat=True),
+            pk=kwargs["pk"],
+        )
+
+        def build():
+            return super(PostViewSet, self).retrieve(request, *args, **kwargs).data
+
+        data = post_detail_cache.get_or_build(
+            post_id, self.get_detail_cache_variant(), build
+        )
+        return Response(data)
+
 
 @extend_schema_view(
-    get=extend_schema(description="Display all posts by user"),
+    get=extend_schema(
+        description="Display all posts by user",
+        parameters=FIELDSET_PARAMETERS,
+        responses=PostListSerializer(many=True),
+    ),
 )
-class LikedPosts(generics.ListAPIView):
-    serializer_class = PostListSerializer
+class LikedPosts(TimedViewMixin, generics.ListAPIView):
+    serializer_class = PostFeedSerializer
+    cursor_ordering = ("-created_at", "-id")
 
     def get_queryset(self):
-        return Post.objects.filter(likes__user=self.request.user)
+        queryset = Post.objects.filter(likes__user=self.request.user)
+
+        liked, unliked = like_buffer.pending_for_user(self.request.user.pk)
+        if liked or unliked:
+            queryset = Post.objects.filter(
+                Q(pk__in=Like.objects.filter(user=self.request.user).values("post"))
+                | Q(pk__in=liked)
+            ).exclude(pk__in=unliked)
+
+        fieldset = Fieldset(self.request, self.serializer_class)
+        return feed_values(queryset, fieldset, self.cursor_ordering)
 
 
 @extend_schema_view(
     post=extend_schema(
         description="Like or unlike(if already liked) post with specified id",
+        request=None,
         responses={
             200: {
                 "type": "object",
@@ -107,28 +196,92 @@ class LikedPosts(generics.ListAPIView):
                 },
             },
         },
-    )
+    ),
+    put=extend_schema(
+        description="Like post with specified id, does nothing if already liked",
+        request=None,
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "detail": {"type": "string"},
+                },
+            },
+        },
+    ),
+    delete=extend_schema(
+        description="Remove like from post with specified id if it exists",
+        request=None,
+        responses={204: None},
+    ),
 )
-class LikeUnlikePost(generics.CreateAPIView):
-    serializer_class = LikeSerializer
+class LikeUnlikePost(TimedViewMixin, APIView):
+    throttle_scope = "like"
+
+    def get_post(self):
+        return get_object_or_404(Post.objects.only("id"), pk=self.kwargs["pk"])
 
     def post(self, request, *args, **kwargs):
-        user = request.user
-        post = Post.objects.get(pk=self.kwargs["pk"])
-        like = Like.objects.filter(user=user, post=post).first()
-        if like:
-            like.delete()
+        post = self.get_post()
+
+        if settings.LIKE_WRITE_BEHIND:
+            if like_buffer.toggle(request.user.pk, post.pk):
+                return Response({"detail": "You liked this post"})
             return Response({"detail": "You unliked this post"})
-        else:
-            serializer = self.get_serializer(data=request.data)
-            serializer.is_valid(raise_exception=True)
-            serializer.save(user=user, post=post)
+
+        with transaction.atomic():
+            if post.unlike(request.user):
+                return Response({"detail": "You unliked this post"})
+
+            post.like(request.user)
             return Response({"detail": "You liked this post"})
 
-    def perform_create(self, serializer):
-        serializer.save(
-            user=self.request.user, post=Post.objects.get(pk=self.kwargs["pk"])
+    def put(self, request, *args, **kwargs):
+        post = self.get_post()
+
+        if settings.LIKE_WRITE_BEHIND:
+            like_buffer.set_liked(request.user.pk, post.pk, True)
+        else:
+            post.like(request.user)
+
+        return Response({"detail": "You liked this post"})
+
+    def delete(self, request, *args, **kwargs):
+        post = self.get_post()
+
+        if settings.LIKE_WRITE_BEHIND:
+            like_buffer.set_liked(request.user.pk, post.pk, False)
+        else:
+            post.unlike(request.user)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class PostSubresourceList(TimedViewMixin, generics.ListAPIView):
+    cursor_ordering = ("-created_at", "-id")
+    related_name = None
+
+    def get_queryset(self):
+        post = get_object_or_404(
+            visible_posts(self.request.user).only("id"), pk=self.kwargs["pk"]
         )
+        return getattr(post, self.related_name).select_related("user")
+
+
+@extend_schema_view(
+    get=extend_schema(description="Display comments of post with specified id"),
+)
+class PostComments(PostSubresourceList):
+    serializer_class = CommentListSerializer
+    related_name = "comments"
+
+
+@extend_schema_view(
+    get=extend_schema(description="Display likes of post with specified id"),
+)
+class PostLikes(PostSubresourceList):
+    serializer_class = LikeListSerializer
+    related_name = "likes"
 
 
 @extend_schema_view(
@@ -136,10 +289,53 @@ class LikeUnlikePost(generics.CreateAPIView):
         description="Add comment to post with specified id",
     )
 )
-class CommentPost(generics.CreateAPIView):
+class CommentPost(TimedViewMixin, generics.CreateAPIView):
     serializer_class = CommentSerializer
 
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(
             user=self.request.user, post=Post.objects.get(pk=self.kwargs["pk"])
         )
+
+
+@extend_schema(
+    description="Stream tags, posts, comments, likes and follow edges as NDJSON "
+    "in fixture format. The X-Export-Watermark response header can be passed "
+    "as `since` to export only rows created afterwards.",
+    parameters=[
+        OpenApiParameter(
+            name="since",
+            description="Watermark of a previous export",
+            required=False,
+            type=str,
+        ),
+    ],
+    responses={(200, "application/x-ndjson"): OpenApiTypes.STR},
+)
+class Export(TimedViewMixin, APIView):
+    permission_classes = (IsAdminUser,)
+
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        try:
+            since = parse_watermark(request.query_params.get("since", ""))
+        except ValueError as error:
+            raise ValidationError({"since": str(error)})
+
+        until = current_watermark()
+        chunks = export_ndjson(since, until)
+        accepts_gzip = re.search(
+            r"\bgzip\b", request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        if accepts_gzip:
+            chunks = gzip_chunks(chunks)
+
+        response = StreamingHttpResponse(chunks, content_type="application/x-ndjson")
+        response["X-Export-Watermark"] = format_watermark(until)
+        response["Vary"] = "Accept-Encoding"
+        if accepts_gzip:
+            response["Content-Encoding"] = "gzip"
+        return response
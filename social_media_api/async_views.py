@@ -0,0 +1,111 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from social_media_api.timing import phase
+
+
+class AsyncReadView(View):
+    """
+    Native async read-only counterpart of a DRF view.
+
+    Authentication, permissions, throttling, querysets and serializers are
+    taken from an instance of `view_class`, while the queries themselves run
+    through the async ORM instead of occupying a worker thread.
+    """
+
+    view_class = None
+    action = None
+    http_method_names = ["get", "head", "options"]
+
+    def get_drf_view(self, request, **kwargs):
+        return self.view_class(
+            request=Request(
+                request,
+                authenticators=[
+                    authentication()
+                    for authentication in self.view_class.authentication_classes
+                ],
+            ),
+            args=(),
+            kwargs=kwargs,
+            format_kwarg=None,
+            action=self.action,
+        )
+
+    def check_request(self, view):
+        with phase("checks"):
+            view.perform_authentication(view.request)
+            view.check_permissions(view.request)
+            view.check_throttles(view.request)
+
+    async def get(self, request, **kwargs):
+        view = self.get_drf_view(request, **kwargs)
+        try:
+            await sync_to_async(self.check_request)(view)
+            data = await self.get_data(view)
+        except (Http404, exceptions.APIException) as error:
+            response = view.handle_exception(error)
+            headers = {
+                header: value
+                for header, value in response.headers.items()
+                if header.lower() != "content-type"
+            }
+            return self.render(response.data, response.status_code, headers)
+
+        return self.render(data)
+
+    async def get_data(self, view):
+        raise NotImplementedError
+
+    async def get_queryset(self, view):
+        # Building a queryset may itself query the database (e.g. the
+        # home timeline checks followed authors), so it runs in a thread.
+        return await sync_to_async(lambda: view.filter_queryset(view.get_queryset()))()
+
+    def render(self, data, status_code=status.HTTP_200_OK, headers=None):
+        with phase("render"):
+            content = JSONRenderer().render(data)
+        return HttpResponse(
+            content,
+            status=status_code,
+            content_type="application/json",
+            headers=headers,
+        )
+
+
+class AsyncListView(AsyncReadView):
+    action = "list"
+
+    async def get_data(self, view):
+        queryset = await self.get_queryset(view)
+        paginator = view.paginator
+        if paginator is None:
+            return await self.serialize(view, [item async for item in queryset])
+
+        page = await paginator.apaginate_queryset(queryset, view.request, view=view)
+        data = await self.serialize(view, page)
+        return paginator.get_paginated_response(data).data
+
+    async def serialize(self, view, items):
+        # Serializers may query as well, e.g. the tag names of the feed.
+        return await sync_to_async(lambda: view.get_serializer(items, many=True).data)()
+
+
+class AsyncRetrieveView(AsyncReadView):
+    action = "retrieve"
+
+    async def get_object(self, view):
+        queryset = await self.get_queryset(view)
+        try:
+            instance = await queryset.aget(pk=view.kwargs["pk"])
+        except queryset.model.DoesNotExist:
+            raise Http404
+        await sync_to_async(view.check_object_permissions)(view.request, instance)
+        return instance
+
+    async def get_data(self, view):
+        return view.get_serializer(await self.get_object(view)).data
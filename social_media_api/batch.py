@@ -0,0 +1,63 @@
+from django.conf import settings
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from social_media_api.fieldsets import FIELDSET_PARAMETERS
+
+# Range of positive primary keys a 64-bit integer column can hold
+MAX_ID = 2**63 - 1
+
+
+def parse_ids(value):
+    """Unique ids of a comma separated list in the order given"""
+    try:
+        ids = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise ValidationError({"ids": "Ids must be comma separated integers"})
+
+    if any(not 1 <= pk <= MAX_ID for pk in ids):
+        raise ValidationError({"ids": f"Ids must be between 1 and {MAX_ID}"})
+
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ValidationError({"ids": "At least one id is required"})
+    if len(ids) > settings.BATCH_MAX_IDS:
+        raise ValidationError(
+            {"ids": f"At most {settings.BATCH_MAX_IDS} ids can be requested"}
+        )
+    return ids
+
+
+class BatchRetrieveMixin:
+    """
+    `batch` action serializing the objects of many ids in one request.
+
+    Objects are looked up in the view queryset with `in_bulk`, so the same
+    visibility rules apply and relations are loaded once for all of them.
+    Results are keyed by id, with null for ids that were not found.
+    """
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="ids",
+                description="Comma separated ids",
+                required=True,
+                type=OpenApiTypes.STR,
+            ),
+            *FIELDSET_PARAMETERS,
+        ],
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(detail=False, methods=["get"])
+    def batch(self, request, *args, **kwargs):
+        ids = parse_ids(request.query_params.get("ids", ""))
+        objects = self.filter_queryset(self.get_queryset()).in_bulk(ids)
+
+        found = list(objects.values())
+        data = self.get_serializer(found, many=True).data
+        serialized = {obj.pk: item for obj, item in zip(found, data)}
+        return Response({"results": {str(pk): serialized.get(pk) for pk in ids}})
@@ -0,0 +1,107 @@
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework.exceptions import ValidationError
+
+FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        name="fields",
+        description="Comma separated fields to include, defaults to all",
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
+    OpenApiParameter(
+        name="expand",
+        description="Comma separated relations to include in full",
+        required=False,
+        type=OpenApiTypes.STR,
+    ),
+]
+
+
+def _query_names(request, param):
+    value = request.GET.get(param) if request is not None else None
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+class Fieldset:
+    """
+    Fields of a serializer selected by the `fields` and `expand` query
+    parameters.
+
+    `Meta.fields` are shown unless `fields` lists others. Fields of
+    `Meta.expandable_fields` are only shown, or shown in full if they are
+    also regular fields, when listed in `expand`.
+    """
+
+    def __init__(self, request, serializer_class):
+        names = tuple(serializer_class.Meta.fields)
+        expandable = tuple(getattr(serializer_class.Meta, "expandable_fields", ()))
+        requested = _query_names(request, "fields")
+        self.expanded = _query_names(request, "expand") or set()
+
+        errors = {}
+        unknown = (requested or set()) - {*names, *expandable}
+        if unknown:
+            errors["fields"] = f"Unknown fields: {', '.join(sorted(unknown))}"
+        unknown = self.expanded - set(expandable)
+        if unknown:
+            errors["expand"] = f"Unknown relations: {', '.join(sorted(unknown))}"
+        if errors:
+            raise ValidationError(errors)
+
+        self.fields = [
+            name
+            for name in (*names, *(name for name in expandable if name not in names))
+            if (name in names or name in self.expanded)
+            and (requested is None or name in requested or name in self.expanded)
+        ]
+        self.key = "fields={}&expand={}".format(
+            ",".join(self.fields), ",".join(sorted(self.expanded))
+        )
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def is_expanded(self, name):
+        return name in self.expanded and name in self.fields
+
+    def columns(self, field_columns):
+        """
+        Model fields read by the selected fields, from a mapping of field
+        names to the model fields they read. Expanded fields are looked up
+        with a `+` suffix, other unmapped fields read the column of their name.
+        """
+        columns = {"pk"}
+        for name in self.fields:
+            if self.is_expanded(name) and f"{name}+" in field_columns:
+                columns.update(field_columns[f"{name}+"])
+            else:
+                columns.update(field_columns.get(name, (name,)))
+        return sorted(columns)
+
+
+def only_columns(queryset, columns):
+    """Load only the given columns, joining the relations they span"""
+    related = {column.rsplit("__", 1)[0] for column in columns if "__" in column}
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+
+class FieldsetMixin:
+    """Limit the fields of a serializer to the Fieldset of its request"""
+
+    def get_fieldset(self):
+        return Fieldset(self.context.get("request"), type(self))
+
+    def get_expanded_field(self, name):
+        raise NotImplementedError
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.get_fieldset()
+        for name in fieldset.expanded:
+            fields[name] = self.get_expanded_field(name)
+        return {name: fields[name] for name in fieldset.fields}
@@ -0,0 +1,227 @@
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction, close_old_connections
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+
+
+def render_variants(data, sizes, quality):
+    """
+    Resize image data to the given variants and encode each as WebP and JPEG.
+
+    `sizes` maps variant names to the longest side in pixels. JPEG sources are
+    decoded at a reduced scale (draft mode) and each variant is reduced from
+    the previous, larger one, so memory stays bounded by the largest variant
+    rather than by the original. Metadata is not carried over.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        largest = max(sizes.values())
+        scale = min(1, largest / max(source.size))
+        source.draft("RGB", (round(source.width * scale), round(source.height * scale)))
+        image = ImageOps.exif_transpose(source)
+
+    has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    image.info = {}
+
+    variants = {}
+    for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        image.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+        files = {}
+        for extension, image_format in FORMATS.items():
+            output = image
+            if image_format == "JPEG" and has_alpha:
+                output = Image.new("RGB", image.size, "white")
+                output.paste(image, mask=image.getchannel("A"))
+            buffer = io.BytesIO()
+            output.save(buffer, image_format, quality=quality, optimize=True)
+            files[extension] = buffer.getvalue()
+
+        variants[name] = {"width": image.width, "height": image.height, "files": files}
+
+    return variants
+
+
+def matching_variants(name, variants):
+    """Return picture variants if they were rendered from the named picture"""
+    if name and variants.get("source") == name:
+        return variants
+    return {}
+
+
+def _absolute(url, request):
+    return request.build_absolute_uri(url) if request else url
+
+
+def picture_url(storage, name, variants, variant, request=None):
+    """URL of a picture variant, the original until variants are ready"""
+    if not name:
+        return None
+
+    stored = matching_variants(name, variants).get(variant)
+    return _absolute(storage.url(stored["webp"] if stored else name), request)
+
+
+def picture_variant_urls(storage, name, variants, request=None):
+    """Dimensions and WebP/JPEG URLs of each picture variant"""
+    return {
+        variant: {
+            "width": stored["width"],
+            "height": stored["height"],
+            "url": _absolute(storage.url(stored["webp"]), request),
+            "jpeg_url": _absolute(storage.url(stored["jpeg"]), request),
+        }
+        for variant, stored in matching_variants(name, variants).items()
+        if variant != "source"
+    }
+
+
+class ImagePipeline:
+    """
+    Background generation of resized picture variants.
+
+    Models using it have a `picture` image field and a `picture_variants`
+    JSON field. When a new picture is committed, its variants are rendered in
+    a pool of `IMAGE_PROCESSING_WORKERS` processes, stored next to the
+    original and recorded with their dimensions in `picture_variants`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = set()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=settings.IMAGE_PROCESSING_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def sync(self, instance):
+        """Schedule processing of the instance picture if it has changed"""
+        name = instance.picture.name or ""
+        if instance.picture_variants.get("source", "") == name:
+            return
+
+        if not name:
+            instance.picture_variants = {}
+            type(instance).objects.filter(pk=instance.pk).update(picture_variants={})
+            return
+
+        transaction.on_commit(partial(self.submit, type(instance), instance.pk, name))
+
+    def submit(self, model, pk, name):
+        key = (model._meta.label, pk, name)
+        with self._lock:
+            if key in self._pending:
+                return None
+            self._pending.add(key)
+
+        try:
+            with model._meta.get_field("picture").storage.open(name) as file:
+                data = file.read()
+            args = (data, settings.IMAGE_VARIANTS, settings.IMAGE_VARIANT_QUALITY)
+
+            if not settings.IMAGE_PROCESSING_WORKERS:
+                self._store(model, pk, name, render_variants(*args))
+                self._pending.discard(key)
+                return None
+
+            future = self._get_executor().submit(render_variants, *args)
+        except Exception:
+            self._pending.discard(key)
+            raise
+
+        future.add_done_callback(partial(self._done, key, model, pk, name))
+        return future
+
+    def _done(self, key, model, pk, name, future):
+        try:
+            self._store(model, pk, name, future.result())
+        except Exception:
+            logger.exception("Failed to process picture %s", name)
+        finally:
+            self._pending.discard(key)
+            close_old_connections()
+
+    def _store(self, model, pk, name, variants):
+        storage = model._meta.get_field("picture").storage
+        stem, _ = os.path.splitext(name)
+
+        stored = {"source": name}
+        for variant, rendered in variants.items():
+            stored[variant] = {"width": rendered["width"], "height": rendered["height"]}
+            for extension, content in rendered["files"].items():
+                stored[variant][extension] = storage.save(
+                    f"{stem}-{variant}.{extension}", ContentFile(content)
+                )
+
+        with transaction.atomic():
+            instance = model.objects.select_for_update().filter(pk=pk).first()
+            if instance is not None and instance.picture.name == name:
+                instance.picture_variants = stored
+                instance.save(update_fields=["picture_variants"])
+                return
+
+        for variant in variants:
+            for extension in FORMATS:
+                storage.delete(stored[variant][extension])
+
+
+image_pipeline = ImagePipeline()
+
+
+@extend_schema_field(OpenApiTypes.URI)
+class PictureField(serializers.Field):
+    """URL of a picture variant, the original until variants are ready"""
+
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        return picture_url(
+            instance.picture.storage,
+            instance.picture.name,
+            instance.picture_variants,
+            self.variant,
+            self.context.get("request"),
+        )
+
+
+@extend_schema_field(OpenApiTypes.OBJECT)
+class PictureVariantsField(serializers.Field):
+    """Dimensions and WebP/JPEG URLs of each picture variant"""
+
+    def __init__(self, **kwargs):
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        return picture_variant_urls(
+            instance.picture.storage,
+            instance.picture.name,
+            instance.picture_variants,
+            self.context.get("request"),
+        )
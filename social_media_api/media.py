@@ -0,0 +1,159 @@
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CONTENT_ADDRESSED_RE = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+@lru_cache(maxsize=4096)
+def content_etag(path, mtime_ns, size):
+    """Return a strong ETag of the file content, cached per file version"""
+    with open(path, "rb") as file:
+        digest = hashlib.file_digest(file, "sha256").hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def parse_range(header, size):
+    """
+    Return the first and last byte of a single `bytes` range.
+
+    Returns None when the whole file should be served, i.e. when the header is
+    missing, malformed or asks for multiple ranges.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    start, end = match.groups()
+    if not start:
+        if int(end) == 0:
+            raise RangeNotSatisfiable()
+        return max(size - int(end), 0), size - 1
+
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(int(end), size - 1) if end else size - 1
+
+
+class FileRange:
+    """Window of an open file that keeps its descriptor usable for sendfile"""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT.
+
+    Responses carry a content hash ETag and honour conditional and single
+    range requests. Files are streamed with `FileResponse`, which WSGI servers
+    send with `os.sendfile`, or handed off to the front proxy when
+    `MEDIA_SENDFILE_HEADER` is set.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat_result = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("File does not exist")
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404("File does not exist")
+
+    size = stat_result.st_size
+    etag = content_etag(full_path, stat_result.st_mtime_ns, size)
+    last_modified = http_date(stat_result.st_mtime)
+    content_type, _ = mimetypes.guess_type(full_path)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Cache-Control": (
+            IMMUTABLE_CACHE_CONTROL
+            if CONTENT_ADDRESSED_RE.search(os.path.basename(full_path))
+            else REVALIDATE_CACHE_CONTROL
+        ),
+        "Accept-Ranges": "bytes",
+        "Content-Type": content_type or "application/octet-stream",
+    }
+
+    response = HttpResponse(headers=headers)
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=int(stat_result.st_mtime), response=response
+    )
+    if conditional is not response:
+        return conditional
+
+    sendfile_header = settings.MEDIA_SENDFILE_HEADER
+    if sendfile_header:
+        if sendfile_header == "X-Accel-Redirect":
+            location = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + path
+        else:
+            location = full_path
+        # Proxies decode the location, while Django would MIME-encode
+        # non-ASCII header values.
+        response[sendfile_header] = quote(location)
+        return response
+
+    if_range = request.headers.get("If-Range")
+    byte_range = None
+    if if_range is None or if_range in (etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers.get("Range", ""), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416, headers=headers)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    file = open(full_path, "rb")
+    if byte_range is None:
+        response = FileResponse(file, headers=headers)
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            FileRange(file, start, end - start + 1), status=206, headers=headers
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = end - start + 1
+
+    return response
@@ -0,0 +1,110 @@
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from social_media_api.timing import instrument, timed_request
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by view",
+    ["view"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter(
+    "http_requests", "Requests by view and response status", ["view", "status"]
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries per request by view",
+    ["view"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_duration_seconds",
+    "SQL time per request by view",
+    ["view"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups", "Cache lookups by cache and result", ["cache", "result"]
+)
+THROTTLE_REJECTIONS = Counter(
+    "throttle_rejections", "Requests rejected by throttles by scope", ["scope"]
+)
+
+
+def view_name(view, method):
+    """Label a view as `<class>.<action>`, e.g. `PostViewSet.list`"""
+    view_class = getattr(view, "cls", None) or getattr(view, "view_class", None)
+    if view_class is None:
+        return view.__name__
+
+    method = method.lower()
+    actions = getattr(view, "actions", None) or {}
+    return f"{view_class.__name__}.{actions.get(method, method)}"
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status and database queries of every request labelled by
+    the view that handled it, `unresolved` for requests matching no URL.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+
+        instrument()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        started = time.perf_counter()
+        with timed_request() as timings:
+            response = self.get_response(request)
+        self.observe(request, response, timings, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with timed_request() as timings:
+            response = await self.get_response(request)
+        self.observe(request, response, timings, time.perf_counter() - started)
+        return response
+
+    def observe(self, request, response, timings, duration):
+        match = getattr(request, "resolver_match", None)
+        view = view_name(match.func, request.method) if match else "unresolved"
+
+        REQUEST_LATENCY.labels(view).observe(duration)
+        REQUESTS.labels(view, response.status_code).inc()
+        REQUEST_QUERIES.labels(view).observe(len(timings.queries))
+        REQUEST_DB_TIME.labels(view).observe(timings.sql_time)
+
+
+def collect():
+    """Metrics in text exposition format, summed over all worker processes"""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(REGISTRY)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
@@ -0,0 +1,156 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor
+
+# Errors raised for cursor positions the database cannot compare against,
+# e.g. non-numeric or out-of-range ids
+INVALID_POSITION_ERRORS = (TypeError, ValueError, OverflowError, ValidationError)
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination keyed on every ordering field.
+
+    The ordering must be unique, so a page is always selected with a single
+    range condition and never with OFFSET or COUNT(*). Views may override
+    the ordering with a `cursor_ordering` attribute.
+    """
+
+    ordering = ("id",)
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, "cursor_ordering", self.ordering)
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self._get_page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+
+        try:
+            results = list(page_queryset)
+        except INVALID_POSITION_ERRORS:
+            raise NotFound(self.invalid_cursor_message)
+        return self._set_page(results)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_queryset = self._get_page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+
+        try:
+            results = [item async for item in page_queryset]
+        except INVALID_POSITION_ERRORS:
+            raise NotFound(self.invalid_cursor_message)
+        return self._set_page(results)
+
+    def _get_page_queryset(self, queryset, request, view):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            self.reverse, self.current_position = False, None
+        else:
+            self.reverse, self.current_position = (
+                self.cursor.reverse,
+                self.cursor.position,
+            )
+
+        if self.reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if self.current_position is not None:
+            condition = self._keyset_filter(self.current_position, self.reverse)
+            try:
+                queryset = queryset.filter(condition)
+            except INVALID_POSITION_ERRORS:
+                raise NotFound(self.invalid_cursor_message)
+
+        return queryset[: self.page_size + 1]
+
+    def _set_page(self, results):
+        self.page = results[: self.page_size]
+        has_more = len(results) > len(self.page)
+        has_position = self.current_position is not None
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = has_position
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = has_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        if self.page:
+            position = self._get_position_from_instance(self.page[-1], self.ordering)
+        else:
+            position = self.current_position
+
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+
+        if self.page:
+            position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            position = self.current_position
+
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip("-")
+            if isinstance(instance, dict):
+                values.append(str(instance[field_name]))
+            else:
+                values.append(str(getattr(instance, field_name)))
+        return json.dumps(values)
+
+    def _keyset_filter(self, position, reverse):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        equal = Q()
+        for order, value in zip(self.ordering, values):
+            field_name = order.lstrip("-")
+            lookup = "lt" if order.startswith("-") != reverse else "gt"
+            condition |= equal & Q(**{f"{field_name}__{lookup}": value})
+            equal &= Q(**{field_name: value})
+        return condition
+
+
+def _reverse_ordering(ordering):
+    return tuple(
+        order[1:] if order.startswith("-") else f"-{order}" for order in ordering
+    )
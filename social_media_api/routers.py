@@ -0,0 +1,135 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import SimpleLazyObject
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_routing = ContextVar("read_routing", default=None)
+
+
+def _sticky_key(user_id):
+    return f"primary-sticky:{user_id}"
+
+
+def _authenticated_user(request):
+    # The session user of AuthenticationMiddleware is lazy and loading it
+    # would query the database while routing; DRF replaces it with the user
+    # it authenticated.
+    user = request.__dict__.get("user")
+    if user is None or type(user) is SimpleLazyObject:
+        return None
+    return user
+
+
+class ReadRouting:
+    """Where the reads of a single request go"""
+
+    def __init__(self, request):
+        self.request = request
+        self.replica = None
+        self.pinned = 0
+
+    def database(self):
+        if self.pinned or self.request.method not in SAFE_METHODS:
+            return DEFAULT_DB_ALIAS
+        if self.replica is not None:
+            return self.replica
+
+        user = _authenticated_user(self.request)
+        if user is None:
+            # Not authenticated yet, e.g. while looking up the token.
+            return DEFAULT_DB_ALIAS
+        if user.is_authenticated and cache.get(_sticky_key(user.pk)):
+            self.replica = DEFAULT_DB_ALIAS
+        else:
+            # One replica per request, so all its reads see the same lag.
+            self.replica = random.choice(settings.DATABASE_REPLICAS)
+        return self.replica
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary in the block, e.g. to fill caches"""
+    routing = _routing.get()
+    if routing is None:
+        yield
+        return
+
+    routing.pinned += 1
+    try:
+        yield
+    finally:
+        routing.pinned -= 1
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads of safe-method requests to an alias of `DATABASE_REPLICAS`
+    picked at random per request and everything else to the primary.
+
+    Users stick to the primary for `READ_YOUR_WRITES_WINDOW` seconds after an
+    unsafe request, so they see their own writes despite replication lag.
+    Reads outside requests, e.g. in commands, always use the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None or not settings.DATABASE_REPLICAS:
+            return DEFAULT_DB_ALIAS
+        return routing.database()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+
+class ReadRoutingMiddleware:
+    """Track the current request for PrimaryReplicaRouter"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = _routing.set(ReadRouting(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        self.stick_to_primary(request)
+        return response
+
+    async def __acall__(self, request):
+        token = _routing.set(ReadRouting(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        self.stick_to_primary(request)
+        return response
+
+    def stick_to_primary(self, request):
+        if request.method in SAFE_METHODS or not settings.DATABASE_REPLICAS:
+            return
+
+        user = _authenticated_user(request)
+        if user is not None and user.is_authenticated:
+            cache.set(_sticky_key(user.pk), True, settings.READ_YOUR_WRITES_WINDOW)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "social_media_api.metrics.MetricsMiddleware",
+    "social_media_api.timing.ServerTimingMiddleware",
+    "social_media_api.routers.ReadRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -82,9 +86,43 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+    },
+    # Local stand-in for a read replica, copied from the primary by
+    # `python manage.py sync_replica`.
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db-replica.sqlite3",
+    },
 }
 
+DATABASE_ROUTERS = ["social_media_api.routers.PrimaryReplicaRouter"]
+
+# Safe-method requests read from one of DATABASE_REPLICAS (none by default,
+# e.g. ["replica"]), users stick to the primary for READ_YOUR_WRITES_WINDOW
+# seconds after writing. Stickiness is kept in the shared cache below.
+DATABASE_REPLICAS = []
+READ_YOUR_WRITES_WINDOW = 5
+
+# The cache holds post detail bodies with their version stamps and rebuild
+# locks, and read-your-writes stickiness, so it must be shared by all worker
+# processes. Locally it is a directory; deployments spanning several hosts
+# set REDIS_URL (needs the `redis` package). The file cache's add() is not
+# atomic across processes, so two workers may rarely rebuild the same entry.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": BASE_DIR / "cache",
+        }
+    }
+
 AUTH_USER_MODEL = "user.User"
 
 # Password validation
@@ -126,6 +164,13 @@ STATIC_URL = "static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Media files are streamed by the application unless MEDIA_SENDFILE_HEADER
+# hands them off to the front proxy: "X-Accel-Redirect" for nginx, where
+# MEDIA_ACCEL_REDIRECT_PREFIX is an internal location aliasing MEDIA_ROOT, or
+# "X-Sendfile" for Apache and lighttpd.
+MEDIA_SENDFILE_HEADER = None
+MEDIA_ACCEL_REDIRECT_PREFIX = "/protected-media/"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -133,19 +178,33 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "user.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_PAGINATION_CLASS": "social_media_api.pagination.KeysetCursorPagination",
+    "PAGE_SIZE": 20,
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "social_media_api.throttling.AnonGCRAThrottle",
+        "social_media_api.throttling.UserGCRAThrottle",
+        "social_media_api.throttling.ScopedGCRAThrottle",
     ],
-    "DEFAULT_THROTTLE_RATES": {"anon": "100/day", "user": "1000/day"},
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": "100/day",
+        "user": "1000/day",
+        "like": "300/hour",
+        "login": "10/minute",
+    },
 }
 
+# Throttle state is shared by all worker processes through this SQLite file,
+# the test runner keeps it in memory.
+THROTTLE_DATABASE = BASE_DIR / "throttle.sqlite3"
+
+TEST_RUNNER = "social_media_api.test_runner.TestRunner"
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Social Media API",
     "DESCRIPTION": "RESTful API for a social media platform, "
@@ -155,3 +214,81 @@ SPECTACULAR_SETTINGS = {
     "VERSION": "1.0.0",
     "SERVE_INCLUDE_SCHEMA": False,
 }
+
+# Home timeline: posts are fanned out to followers' timelines on write,
+# except for authors with at least TIMELINE_FAN_OUT_THRESHOLD followers,
+# whose posts are merged into the feed on read.
+TIMELINE_FAN_OUT_THRESHOLD = 10000
+TIMELINE_FAN_OUT_BATCH_SIZE = 1000
+TIMELINE_BACKFILL_SIZE = 200
+
+# Write-behind likes: when enabled, like/unlike requests are buffered in
+# process and flushed to the database in bulk every
+# LIKE_WRITE_BEHIND_INTERVAL seconds (0 disables the background flusher).
+LIKE_WRITE_BEHIND = False
+LIKE_WRITE_BEHIND_INTERVAL = 1.0
+
+# Post detail cache: serialized post bodies are cached for
+# POST_DETAIL_CACHE_TIMEOUT seconds; a rebuild holds a lock for at most
+# POST_DETAIL_CACHE_LOCK_TIMEOUT seconds while other requests wait for it.
+POST_DETAIL_CACHE_TIMEOUT = 300
+POST_DETAIL_CACHE_LOCK_TIMEOUT = 5
+
+# Batch endpoints (`posts/batch/`, `users/batch/`) resolve at most
+# BATCH_MAX_IDS ids per request.
+BATCH_MAX_IDS = 200
+
+# Token authentication cache: up to TOKEN_CACHE_SIZE token -> user entries are
+# kept in each process for TOKEN_CACHE_TIMEOUT seconds. Each hit checks a
+# revocation stamp of the user in the shared cache, so user changes, logouts
+# and deactivations apply to all processes at once.
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TIMEOUT = 60
+
+# Password hashing for logins runs in a pool of LOGIN_HASH_WORKERS threads,
+# logins beyond LOGIN_HASH_QUEUE_SIZE running or queued hashes are rejected.
+LOGIN_HASH_WORKERS = 4
+LOGIN_HASH_QUEUE_SIZE = 32
+
+# Uploaded pictures are resized to IMAGE_VARIANTS (longest side in pixels)
+# in a pool of IMAGE_PROCESSING_WORKERS processes once the upload is
+# committed, 0 workers renders them in the committing thread.
+IMAGE_VARIANTS = {"thumbnail": 160, "feed": 720, "full": 1600}
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_PROCESSING_WORKERS = 2
+
+# Server-Timing: a SERVER_TIMING_SAMPLE_RATE fraction of requests reports its
+# SQL, check, serialization and render times (0 disables the instrumentation).
+# Requests slower than SERVER_TIMING_SLOW_THRESHOLD milliseconds that are among
+# the SERVER_TIMING_SLOW_REQUESTS slowest are logged with their slowest queries.
+SERVER_TIMING_SAMPLE_RATE = 1.0
+SERVER_TIMING_SLOW_REQUESTS = 10
+SERVER_TIMING_SLOW_THRESHOLD = 500
+SERVER_TIMING_TOP_QUERIES = 5
+
+# Prometheus metrics of all requests are served at /metrics/ to admins. With
+# several worker processes, point the PROMETHEUS_MULTIPROC_DIR environment
+# variable at a directory shared by them that is emptied before they start.
+METRICS_ENABLED = True
+
+# Query plan guard (`python manage.py check_query_plans`): requests may run at
+# most QUERY_PLAN_BUDGET queries, full scans, temp B-tree sorts and client errors
+# of GET routes fail unless listed for the route in QUERY_PLAN_ALLOWED_PROBLEMS.
+QUERY_PLAN_BUDGET = 10
+QUERY_PLAN_ALLOWED_PROBLEMS = {
+    # Pages of tags and users are read in primary key order and stop early.
+    "post:tag-list": ["full scan post_tag"],
+    "user:user-list": ["full scan user_user"],
+    "user:async-user-list": ["full scan user_user"],
+    # Substring searches (?tag=, ?username=) cannot use an index.
+    "post:post-list": ["full scan post_tag"],
+    # Exports are for staff only.
+    "post:export": ["client error 403"],
+    # Liked posts and follow lists are sorted after joining the user's rows.
+    "post:liked-posts": ["temp b-tree for ORDER BY"],
+    "post:async-liked-posts": ["temp b-tree for ORDER BY"],
+    "user:followers": ["temp b-tree for ORDER BY"],
+    "user:following": ["temp b-tree for ORDER BY"],
+    "user:async-followers": ["temp b-tree for ORDER BY"],
+    "user:async-following": ["temp b-tree for ORDER BY"],
+}
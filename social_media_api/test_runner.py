@@ -0,0 +1,27 @@
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Test runner keeping throttle state and the cache in memory, so runs never
+    share them with each other or a running server, nor exhaust the daily
+    rates, and leaving slow requests unlogged.
+    """
+
+    test_settings = override_settings(
+        THROTTLE_DATABASE=":memory:",
+        SERVER_TIMING_SLOW_REQUESTS=0,
+        # Unlike the file cache, its add() is atomic within the process.
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        },
+    )
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,119 @@
+import sqlite3
+import threading
+
+from django.conf import settings
+from rest_framework import throttling
+
+from social_media_api.metrics import THROTTLE_REJECTIONS
+
+
+class SQLiteThrottleBackend:
+    """
+    GCRA state store shared by worker processes through a SQLite file.
+
+    Every key keeps a single "theoretical arrival time", updated inside an
+    immediate transaction so concurrent processes never lose an update.
+    """
+
+    purge_every = 1000
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS throttle "
+                "(key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID"
+            )
+            self._local.connection = connection
+            self._local.updates = 0
+        return connection
+
+    def update(self, key, limit, period, now):
+        """
+        Register a request for `key` limited to `limit` requests per `period`
+        seconds, return `(allowed, wait)`
+        """
+        connection = self._connection()
+        interval = period / limit
+
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT tat FROM throttle WHERE key = ?", (key,)
+            ).fetchone()
+            new_tat = max(row[0] if row else now, now) + interval
+            allowed_at = new_tat - period
+            if allowed_at > now:
+                connection.execute("ROLLBACK")
+                return False, allowed_at - now
+
+            connection.execute(
+                "INSERT INTO throttle (key, tat) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tat = excluded.tat",
+                (key, new_tat),
+            )
+            self._local.updates += 1
+            if self._local.updates % self.purge_every == 0:
+                connection.execute("DELETE FROM throttle WHERE tat < ?", (now,))
+            connection.execute("COMMIT")
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+
+        return True, None
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = SQLiteThrottleBackend(settings.THROTTLE_DATABASE)
+    return _backend
+
+
+class GCRARateThrottle(throttling.SimpleRateThrottle):
+    """
+    Rate throttle implementing the generic cell rate algorithm, a token
+    bucket storing one timestamp per key instead of a request history.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        allowed, self._wait = get_backend().update(
+            f"{self.scope}:{self.key}", self.num_requests, self.duration, self.timer()
+        )
+        if not allowed:
+            THROTTLE_REJECTIONS.labels(self.scope).inc()
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class AnonGCRAThrottle(throttling.AnonRateThrottle, GCRARateThrottle):
+    pass
+
+
+class UserGCRAThrottle(throttling.UserRateThrottle, GCRARateThrottle):
+    pass
+
+
+class ScopedGCRAThrottle(throttling.ScopedRateThrottle, GCRARateThrottle):
+    pass
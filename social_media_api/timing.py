@@ -0,0 +1,245 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """
+    SQL, check, serialization and render times of a single request.
+
+    Phases exclude the SQL run while they are active, which is reported
+    separately, and nested entries into the same phase are not counted twice.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = None
+        self.sql_time = 0.0
+        self.queries = []
+        self.durations = {}
+        self.running = {}
+
+    def add_query(self, sql, duration):
+        self.sql_time += duration
+        self.queries.append((duration, sql))
+
+    def start(self, name):
+        if name not in self.running:
+            self.running[name] = (time.perf_counter(), self.sql_time)
+            return True
+        return False
+
+    def stop(self, name):
+        started, sql_time = self.running.pop(name)
+        duration = time.perf_counter() - started - (self.sql_time - sql_time)
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    @contextmanager
+    def phase(self, name):
+        if not self.start(name):
+            yield
+            return
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def header(self):
+        metrics = [
+            f'db;desc="{len(self.queries)} queries";dur={self.sql_time * 1000:.1f}'
+        ]
+        metrics += [
+            f"{name};dur={duration * 1000:.1f}"
+            for name, duration in self.durations.items()
+        ]
+        metrics.append(f"total;dur={self.total * 1000:.1f}")
+        return ", ".join(metrics)
+
+
+@contextmanager
+def timed_request():
+    """Time the request handled in the block, joining an enclosing timed request"""
+    timings = _current.get()
+    if timings is not None:
+        yield timings
+        return
+
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def phase(name):
+    """Attribute the time spent in the block to `name` if the request is timed"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    with timings.phase(name):
+        yield
+
+
+class TimedViewMixin:
+    """Time the authentication, permission and throttle checks of a DRF view"""
+
+    def initial(self, request, *args, **kwargs):
+        with phase("checks"):
+            return super().initial(request, *args, **kwargs)
+
+
+class TimedSerializerMixin:
+    """Time the serialization of a DRF serializer, or of its items in a list"""
+
+    @property
+    def data(self):
+        with phase("serialize"):
+            return super().data
+
+    def to_representation(self, instance):
+        with phase("serialize"):
+            return super().to_representation(instance)
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(sql, time.perf_counter() - started)
+
+
+def _add_execute_wrapper(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def instrument():
+    """Time the SQL of all connections"""
+    for connection in connections.all(initialized_only=True):
+        _add_execute_wrapper(connection)
+    connection_created.connect(_add_execute_wrapper)
+
+
+class SlowRequestLog:
+    """Log requests that enter the `size` slowest seen by this process"""
+
+    def __init__(self, size, threshold, top_queries):
+        self.size = size
+        self.threshold = threshold
+        self.top_queries = top_queries
+        self.slowest = []
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def add(self, request, timings):
+        if not self.size or timings.total * 1000 < self.threshold:
+            return
+
+        with self.lock:
+            entry = (timings.total, next(self.counter))
+            if len(self.slowest) < self.size:
+                heapq.heappush(self.slowest, entry)
+            elif entry > self.slowest[0]:
+                heapq.heapreplace(self.slowest, entry)
+            else:
+                return
+
+        logger.warning(
+            "Slow request %s %s: %s\n%s",
+            request.method,
+            request.get_full_path(),
+            timings.header(),
+            "\n".join(
+                f"  {duration * 1000:.1f}ms {sql}"
+                for duration, sql in heapq.nlargest(
+                    self.top_queries, timings.queries, key=lambda query: query[0]
+                )
+            ),
+        )
+
+
+class ServerTimingMiddleware:
+    """
+    Report per-request SQL, check, serialization and render times in a
+    `Server-Timing` header and log the slowest requests with their queries.
+
+    Only a `SERVER_TIMING_SAMPLE_RATE` fraction of requests is timed, with 0
+    the middleware and its instrumentation are not installed at all.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.SERVER_TIMING_SAMPLE_RATE
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+
+        instrument()
+        self.slow_requests = SlowRequestLog(
+            settings.SERVER_TIMING_SLOW_REQUESTS,
+            settings.SERVER_TIMING_SLOW_THRESHOLD,
+            settings.SERVER_TIMING_TOP_QUERIES,
+        )
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        with timed_request() as timings:
+            response = self.get_response(request)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        with timed_request() as timings:
+            response = await self.get_response(request)
+        return self.finish(request, response, timings)
+
+    def process_template_response(self, request, response):
+        timings = _current.get()
+        if timings is not None and timings.start("render"):
+            response.add_post_render_callback(lambda response: timings.stop("render"))
+        return response
+
+    def finish(self, request, response, timings):
+        timings.finish()
+        response.headers["Server-Timing"] = timings.header()
+        self.slow_requests.add(request, timings)
+        return response
@@ -0,0 +1,22 @@
+from django.http import HttpResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from prometheus_client import CONTENT_TYPE_LATEST
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+
+from social_media_api.metrics import collect
+from social_media_api.timing import TimedViewMixin
+
+
+@extend_schema(responses={(200, "text/plain"): OpenApiTypes.STR})
+class Metrics(TimedViewMixin, APIView):
+    permission_classes = (IsAdminUser,)
+    # Scrapes must never be throttled.
+    throttle_classes = ()
+
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        return HttpResponse(collect(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,18 @@
+from social_media_api.async_views import AsyncListView, AsyncRetrieveView
+from user.views import UserViewSet, MyFollowersList, MyFollowingList
+
+
+class AsyncUserList(AsyncListView):
+    view_class = UserViewSet
+
+
+class AsyncUserDetail(AsyncRetrieveView):
+    view_class = UserViewSet
+
+
+class AsyncFollowersList(AsyncListView):
+    view_class = MyFollowersList
+
+
+class AsyncFollowingList(AsyncListView):
+    view_class = MyFollowingList
@@ -0,0 +1,121 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from social_media_api.metrics import CACHE_LOOKUPS
+
+
+class TokenUserCache:
+    """
+    Bounded in-process LRU cache of token key -> user snapshot.
+
+    Entries expire after `TOKEN_CACHE_TIMEOUT` seconds. Invalidating a user
+    stores the time of revocation in the shared cache, and a hit is only
+    served if its snapshot was fetched after that, so changes, logouts and
+    deactivations in one worker process reach all of them.
+    """
+
+    prefix = "token-user:revoked"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _revoked_key(self, user_id):
+        return f"{self.prefix}:{user_id}"
+
+    def _revoke(self, user_id):
+        cache.set(self._revoked_key(user_id), time.time_ns(), None)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, user, fetched_at = entry
+            revoked_at = cache.get(self._revoked_key(user.pk), 0)
+            if expires_at < time.monotonic() or revoked_at >= fetched_at:
+                entry = None
+                with self._lock:
+                    self._discard(key)
+
+        if entry is None:
+            self.misses += 1
+            CACHE_LOOKUPS.labels("token", "miss").inc()
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        self.hits += 1
+        CACHE_LOOKUPS.labels("token", "hit").inc()
+        return copy.copy(user)
+
+    def set(self, key, user, fetched_at):
+        """Cache the user of a token, read from the database at `fetched_at`"""
+        expires_at = time.monotonic() + settings.TOKEN_CACHE_TIMEOUT
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (expires_at, copy.copy(user), fetched_at)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > settings.TOKEN_CACHE_SIZE:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._discard(key)
+        self._revoke(user_id)
+        # Another process may have read the user before the change was committed.
+        transaction.on_commit(lambda: self._revoke(user_id))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_keys = self._keys_by_user.get(entry[1].pk)
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[entry[1].pk]
+
+
+token_user_cache = TokenUserCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication skipping the token/user query for cached tokens"""
+
+    def authenticate_credentials(self, key):
+        user = token_user_cache.get(key)
+        if user is not None:
+            return user, Token(key=key, user=user)
+
+        fetched_at = time.time_ns()
+        user, token = super().authenticate_credentials(key)
+        token_user_cache.set(key, user, fetched_at)
+        return user, token
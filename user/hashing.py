@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashPoolBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many logins in progress, try again later."
+    default_code = "hash_pool_busy"
+
+
+class PasswordHashPool:
+    """
+    Bounded thread pool for password hashing.
+
+    PBKDF2 releases the GIL, so hashing runs in parallel with request
+    handling. At most `LOGIN_HASH_QUEUE_SIZE` hashes may be running or queued,
+    further submissions are rejected immediately with `HashPoolBusy`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.LOGIN_HASH_WORKERS,
+                    thread_name_prefix="password-hash",
+                )
+                self._slots = threading.BoundedSemaphore(settings.LOGIN_HASH_QUEUE_SIZE)
+
+    def submit(self, fn, *args):
+        self._ensure_started()
+        if not self._slots.acquire(blocking=False):
+            raise HashPoolBusy()
+
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    async def arun(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+
+hash_pool = PasswordHashPool()
+
+
+def _check(raw_password, encoded):
+    """Return `(is_correct, must_update)` for the password"""
+    must_update = []
+    is_correct = check_password(
+        raw_password, encoded, setter=lambda _: must_update.append(True)
+    )
+    return is_correct, bool(must_update)
+
+
+def verify_password(user, raw_password):
+    """
+    Check the password in the hash pool, rehashing it when the hasher
+    parameters have changed since it was set
+    """
+    is_correct, must_update = hash_pool.run(_check, raw_password, user.password)
+    if must_update:
+        hash_pool.run(user.set_password, raw_password)
+        user.save(update_fields=["password"])
+    return is_correct
+
+
+async def averify_password(user, raw_password):
+    is_correct, must_update = await hash_pool.arun(_check, raw_password, user.password)
+    if must_update:
+        await hash_pool.arun(user.set_password, raw_password)
+        await user.asave(update_fields=["password"])
+    return is_correct
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value, F, Q
+from django.db.models.functions import Coalesce
+
+from user.models import User
+
+
+def count_of(field):
+    return Coalesce(
+        Subquery(
+            User.following.through.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        Value(0),
+    )
+
+
+class Command(BaseCommand):
+    help = "Verify and rebuild denormalized follower/following counters on users"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report users with drifted counters, do not fix them",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drifted_ids = list(
+                User.objects.annotate(
+                    actual_followers=count_of("to_user"),
+                    actual_following=count_of("from_user"),
+                )
+                .filter(
+                    ~Q(follower_count=F("actual_followers"))
+                    | ~Q(following_count=F("actual_following"))
+                )
+                .values_list("pk", flat=True)
+            )
+
+            if options["check"]:
+                for pk in drifted_ids:
+                    self.stdout.write(f"User {pk} has drifted counters")
+                if drifted_ids:
+                    raise CommandError(f"{len(drifted_ids)} user(s) out of sync")
+                self.stdout.write(self.style.SUCCESS("All user counters are in sync"))
+                return
+
+            User.objects.filter(pk__in=drifted_ids).update(
+                follower_count=count_of("to_user"),
+                following_count=count_of("from_user"),
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt counters for {len(drifted_ids)} user(s)")
+        )
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.6 on 2026-10-18 01:27
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    User = apps.get_model("user", "User")
+    Following = User.following.through
+
+    def count_of(field):
+        return Coalesce(
+            Subquery(
+                Following.objects.filter(**{field: OuterRef("pk")})
+                .order_by()
+                .values(field)
+                .annotate(total=Count("pk"))
+                .values("total")
+            ),
+            Value(0),
+        )
+
+    User.objects.update(
+        follower_count=count_of("to_user"), following_count=count_of("from_user")
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0002_alter_user_first_name_alter_user_following_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="follower_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="following_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
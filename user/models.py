@@ -2,11 +2,24 @@ from django.contrib.auth.models import (
     AbstractUser,
     BaseUserManager,
 )
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import m2m_changed
 from django.utils.translation import gettext as _
 
 
-class UserManager(BaseUserManager):
+class UserQuerySet(models.QuerySet):
+    def with_follow_info(self, viewer):
+        """Annotate whether `viewer` follows each user"""
+        following = self.model.following.through.objects
+        return self.annotate(
+            is_followed=Exists(
+                following.filter(from_user_id=viewer.pk, to_user_id=OuterRef("pk"))
+            )
+        )
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     use_in_migrations = True
 
     def _create_user(self, email: str, password: str, **extra_fields):
@@ -49,9 +62,12 @@ class User(AbstractUser):
         blank=True,
         null=True,
     )
+    picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     following = models.ManyToManyField(
         "self", symmetrical=False, related_name="followers", blank=True
     )
+    follower_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
@@ -60,3 +76,45 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.username
+
+    def _send_following_changed(self, action, pk_set):
+        m2m_changed.send(
+            sender=User.following.through,
+            instance=self,
+            action=action,
+            reverse=False,
+            model=User,
+            pk_set=pk_set,
+            using=self._state.db,
+        )
+
+    def follow(self, *profiles):
+        """Follow given users and return the ids of newly followed ones"""
+        Following = User.following.through
+
+        followed = set()
+        with transaction.atomic():
+            for profile_id in {profile.pk for profile in profiles}:
+                try:
+                    with transaction.atomic():
+                        Following.objects.create(
+                            from_user_id=self.pk, to_user_id=profile_id
+                        )
+                except IntegrityError:
+                    continue
+                followed.add(profile_id)
+            if followed:
+                self._send_following_changed("post_add", followed)
+
+        return followed
+
+    def unfollow(self, profile):
+        """Unfollow given user and return whether they were followed"""
+        with transaction.atomic():
+            deleted, _ = User.following.through.objects.filter(
+                from_user_id=self.pk, to_user_id=profile.pk
+            ).delete()
+            if deleted:
+                self._send_following_changed("post_remove", {profile.pk})
+
+        return bool(deleted)
@@ -1,8 +1,23 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
-
-class UserSerializer(serializers.ModelSerializer):
+from social_media_api.fieldsets import FieldsetMixin
+from social_media_api.images import PictureField, PictureVariantsField
+from social_media_api.timing import TimedSerializerMixin
+
+# Model fields read by user serializer fields whose names are no columns.
+USER_FIELD_COLUMNS = {
+    "picture": ("picture", "picture_variants"),
+    "picture_variants": ("picture", "picture_variants"),
+    "follow": (),
+    "followers_count": ("follower_count",),
+    "following_count": ("following_count",),
+    "follow_unfollow": (),
+    "latest_posts": (),
+}
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
         fields = (
@@ -26,12 +41,16 @@ class UserSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         """Update a user, set the password correctly and return it"""
         password = validated_data.pop("password", None)
-        user = super().update(instance, validated_data)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
         if password:
-            user.set_password(password)
-            user.save()
+            instance.set_password(password)
+            validated_data["password"] = instance.password
 
-        return user
+        # Only the changed fields are saved, the instance may be a cached
+        # snapshot with outdated follow counters and picture variants.
+        instance.save(update_fields=list(validated_data))
+        return instance
 
 
 class UserCreateSerializer(UserSerializer):
@@ -46,16 +65,36 @@ class UserCreateSerializer(UserSerializer):
         return get_user_model().objects.create_user(**validated_data)
 
 
-class UserListSerializer(UserSerializer):
+class UserSummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    picture = PictureField(variant="thumbnail")
+
+    class Meta:
+        model = get_user_model()
+        fields = ("id", "username", "picture")
+
+
+class LatestPostSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    title = serializers.CharField(read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
+
+
+class UserListSerializer(FieldsetMixin, UserSerializer):
+    picture = PictureField(variant="thumbnail")
     follow = serializers.SerializerMethodField()
+    followers_count = serializers.IntegerField(source="follower_count", read_only=True)
+    following_count = serializers.IntegerField(read_only=True)
     follow_unfollow = serializers.HyperlinkedIdentityField(
         view_name="user:follow-unfollow",
     )
 
     def get_follow(self, obj):
+        if hasattr(obj, "is_followed"):
+            return obj.is_followed
+
         request = self.context.get("request")
         if request:
-            return request.user in obj.followers.all()
+            return obj.followers.filter(pk=request.user.pk).exists()
         return False
 
     class Meta:
@@ -65,12 +104,22 @@ class UserListSerializer(UserSerializer):
             "username",
             "first_name",
             "last_name",
+            "picture",
             "follow",
+            "followers_count",
+            "following_count",
             "follow_unfollow",
         )
+        expandable_fields = ("latest_posts",)
+
+    def get_expanded_field(self, name):
+        return LatestPostSerializer(many=True, read_only=True)
 
 
 class UserDetailSerializer(UserListSerializer):
+    picture = PictureField(variant="feed")
+    picture_variants = PictureVariantsField()
+
     class Meta:
         model = get_user_model()
         fields = (
@@ -81,12 +130,22 @@ class UserDetailSerializer(UserListSerializer):
             "last_name",
             "bio",
             "picture",
+            "picture_variants",
             "is_staff",
             "follow",
+            "followers_count",
+            "following_count",
             "follow_unfollow",
         )
+        expandable_fields = ("latest_posts",)
 
 
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
+
+
+class BulkFollowSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=100
+    )
@@ -0,0 +1,73 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, pre_delete, post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from social_media_api.images import image_pipeline
+from user.authentication import token_user_cache
+from user.models import User
+
+
+@receiver(m2m_changed, sender=User.following.through)
+def update_follow_counters(sender, instance, action, reverse, pk_set, **kwargs):
+    related = instance.followers if reverse else instance.following
+
+    if action == "pre_remove":
+        # Django reports the requested ids rather than the removed ones,
+        # narrow them down to existing links so that receivers of
+        # "post_remove" only see what is actually removed.
+        pk_set.intersection_update(
+            related.filter(pk__in=pk_set).values_list("pk", flat=True)
+        )
+        return
+
+    if action == "pre_clear":
+        pk_set, delta = set(related.values_list("pk", flat=True)), -1
+    elif action == "post_add":
+        delta = 1
+    elif action == "post_remove":
+        delta = -1
+    else:
+        return
+
+    if not pk_set:
+        return
+
+    if reverse:
+        own_counter, related_counter = "follower_count", "following_count"
+    else:
+        own_counter, related_counter = "following_count", "follower_count"
+
+    User.objects.filter(pk=instance.pk).update(
+        **{own_counter: F(own_counter) + delta * len(pk_set)}
+    )
+    User.objects.filter(pk__in=pk_set).update(
+        **{related_counter: F(related_counter) + delta}
+    )
+
+
+@receiver(pre_delete, sender=User)
+def release_follow_counters(sender, instance, **kwargs):
+    User.objects.filter(followers=instance).update(
+        follower_count=F("follower_count") - 1
+    )
+    User.objects.filter(following=instance).update(
+        following_count=F("following_count") - 1
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    token_user_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    token_user_cache.invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def process_profile_picture(sender, instance, raw, **kwargs):
+    if not raw:
+        image_pipeline.sync(instance)
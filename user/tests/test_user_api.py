@@ -1,10 +1,30 @@
+import shutil
+import tempfile
+from base64 import b64encode
+from io import BytesIO
+from unittest import mock
+from urllib.parse import urlencode
+
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.sessions.models import Session
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.request import Request
 from rest_framework.test import APITestCase
 from rest_framework.reverse import reverse
 from rest_framework.test import APIRequestFactory
+from PIL import Image
+from prometheus_client import REGISTRY
 
+from post.models import Post
+from social_media_api.throttling import SQLiteThrottleBackend, ScopedGCRAThrottle
+from user.authentication import TokenUserCache, token_user_cache
+from user.hashing import PasswordHashPool
 from user.serializers import UserListSerializer, UserDetailSerializer, UserSerializer
 
 USER_URL = reverse("user:user-list")
@@ -83,6 +103,11 @@ class AuthenticatedUserApiTests(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_logout_without_token(self):
+        response = self.client.get(reverse("user:logout"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["message"], "User Logged out successfully")
 
     def test_user_list(self):
@@ -98,7 +123,79 @@ class AuthenticatedUserApiTests(APITestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
+
+    def test_user_list_tampered_cursor(self):
+        cursor = b64encode(urlencode({"p": '["abc"]'}).encode()).decode()
+
+        response = self.client.get(USER_URL, {"cursor": cursor})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_user_list_follow_state_in_single_query(self):
+        followed = sample_user("followed")
+        sample_user("stranger")
+        self.user.following.add(followed)
+        followed.following.add(self.user)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(USER_URL)
+
+        users = {user["username"]: user for user in response.data["results"]}
+        self.assertTrue(users["followed"]["follow"])
+        self.assertEqual(users["followed"]["followers_count"], 1)
+        self.assertEqual(users["followed"]["following_count"], 1)
+        self.assertFalse(users["stranger"]["follow"])
+        self.assertEqual(users["stranger"]["followers_count"], 0)
+
+    def test_user_list_fields_skip_follow_state(self):
+        followed = sample_user("followed")
+        self.user.following.add(followed)
+
+        with self.assertNumQueries(1) as queries:
+            response = self.client.get(USER_URL, {"fields": "id,username"})
+
+        self.assertEqual(
+            response.data["results"], [{"id": followed.id, "username": "followed"}]
+        )
+        self.assertNotIn("user_user_following", queries.captured_queries[0]["sql"])
+        self.assertNotIn('"email"', queries.captured_queries[0]["sql"])
+
+    def test_user_detail_expands_latest_posts(self):
+        user = sample_user("author")
+        posts = [
+            Post.objects.create(author=user, title=f"Post {index}", content="Content")
+            for index in range(4)
+        ]
+
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                detail_url(user.id), {"fields": "id", "expand": "latest_posts"}
+            )
+
+        self.assertEqual(list(response.data), ["id", "latest_posts"])
+        self.assertEqual(
+            [post["id"] for post in response.data["latest_posts"]],
+            [post.id for post in reversed(posts[1:])],
+        )
+
+    def test_user_batch(self):
+        followed = sample_user("followed")
+        stranger = sample_user("stranger")
+        self.user.following.add(followed)
+        url = reverse("user:user-batch")
+        ids = f"{stranger.id},{self.user.id},{followed.id},{stranger.id}"
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"ids": ids})
+
+        results = response.data["results"]
+        self.assertEqual(
+            list(results), [str(stranger.id), str(self.user.id), str(followed.id)]
+        )
+        self.assertIsNone(results[str(self.user.id)])
+        self.assertTrue(results[str(followed.id)]["follow"])
+        self.assertFalse(results[str(stranger.id)]["follow"])
 
     def test_retrieve_user_detail(self):
         user = sample_user("test_user")
@@ -168,6 +265,77 @@ class AuthenticatedUserApiTests(APITestCase):
             response.data["message"], f"You followed user - {user.username}"
         )
 
+    def test_follow_unfollow_toggle_updates_counters(self):
+        user = sample_user("test_user")
+        url = reverse("user:follow-unfollow", args=[user.id])
+
+        self.client.post(url)
+        user.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual(user.follower_count, 1)
+        self.assertEqual(self.user.following_count, 1)
+
+        response = self.client.post(url)
+        user.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual(
+            response.data["message"], f"You unfollowed user - {user.username}"
+        )
+        self.assertFalse(self.user.following.filter(id=user.id).exists())
+        self.assertEqual(user.follower_count, 0)
+        self.assertEqual(self.user.following_count, 0)
+
+    def test_follow_toggle_deletes_or_inserts_once(self):
+        user = sample_user("test_user")
+        url = reverse("user:follow-unfollow", args=[user.id])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(url)
+
+        following_queries = [
+            query["sql"].split()[0]
+            for query in queries.captured_queries
+            if '"user_user_following"' in query["sql"]
+        ]
+        self.assertEqual(following_queries, ["DELETE", "INSERT"])
+        self.assertTrue(self.user.following.filter(pk=user.pk).exists())
+
+    def test_follow_unknown_user(self):
+        url = reverse("user:follow-unfollow", args=[1000])
+
+        response = self.client.post(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_follow(self):
+        user1 = sample_user("test_user_1")
+        user2 = sample_user("test_user_2")
+        self.user.following.add(user1)
+
+        response = self.client.post(
+            reverse("user:bulk-follow"),
+            {"ids": [user1.id, user2.id, self.user.id]},
+            format="json",
+        )
+        self.user.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["followed"], [user2.id])
+        self.assertEqual(self.user.following_count, 2)
+
+    def test_removing_unfollowed_user_keeps_counters(self):
+        user = sample_user("test_user")
+
+        self.user.following.remove(user)
+        user.followers.add(self.user)
+        user.followers.remove(self.user)
+        self.user.following.clear()
+        user.refresh_from_db()
+        self.user.refresh_from_db()
+
+        self.assertEqual(user.follower_count, 0)
+        self.assertEqual(self.user.following_count, 0)
+
     def test_list_user_followers(self):
         user1 = sample_user("test_user_1")
         user2 = sample_user("test_user_2")
@@ -183,7 +351,7 @@ class AuthenticatedUserApiTests(APITestCase):
         serializer = UserSerializer(users, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_list_user_following(self):
         user1 = sample_user("test_user_1")
@@ -200,4 +368,231 @@ class AuthenticatedUserApiTests(APITestCase):
         serializer = UserSerializer(users, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        token_user_cache.clear()
+        self.user = sample_user("user")
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_cached_token_skips_query(self):
+        self.client.get(USER_MANAGE_URL)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(USER_MANAGE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(token_user_cache.stats()["hits"], 1)
+
+    def test_logout_invalidates_cached_token(self):
+        self.client.get(USER_MANAGE_URL)
+
+        self.client.get(reverse("user:logout"))
+        response = self.client.get(USER_MANAGE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_invalidates_cached_user(self):
+        self.client.get(USER_MANAGE_URL)
+
+        self.client.patch(USER_MANAGE_URL, {"bio": "New bio"})
+        response = self.client.get(USER_MANAGE_URL)
+
+        self.assertEqual(response.data["bio"], "New bio")
+
+    def test_profile_update_keeps_follow_counters(self):
+        self.client.get(USER_MANAGE_URL)
+        sample_user("follower").following.add(self.user)
+
+        self.client.patch(USER_MANAGE_URL, {"bio": "New bio"})
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.bio, "New bio")
+        self.assertEqual(self.user.follower_count, 1)
+
+    def test_deactivation_invalidates_cached_user(self):
+        self.client.get(USER_MANAGE_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(USER_MANAGE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalidation_in_another_process_revokes_cached_user(self):
+        self.client.get(USER_MANAGE_URL)
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+
+        TokenUserCache().invalidate_user(self.user.pk)
+        with self.assertNumQueries(1):
+            response = self.client.get(USER_MANAGE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ThrottleTests(APITestCase):
+    def test_gcra_backend_limits_bursts_and_refills(self):
+        backend = SQLiteThrottleBackend(":memory:")
+
+        self.assertEqual(backend.update("key", 2, 60, now=0), (True, None))
+        self.assertEqual(backend.update("key", 2, 60, now=0), (True, None))
+        self.assertEqual(backend.update("key", 2, 60, now=0), (False, 30))
+        self.assertEqual(backend.update("key", 2, 60, now=30), (True, None))
+        self.assertEqual(backend.update("other", 2, 60, now=30), (True, None))
+
+    def test_login_has_own_throttle_scope(self):
+        sample_user("user")
+        url = reverse("user:login")
+        credentials = {"email": "user@gmail.com", "password": "secret_password"}
+        rates = {**ScopedGCRAThrottle.THROTTLE_RATES, "login": "2/minute"}
+
+        with mock.patch.object(ScopedGCRAThrottle, "THROTTLE_RATES", rates), mock.patch(
+            "social_media_api.throttling._backend", SQLiteThrottleBackend(":memory:")
+        ):
+            responses = [self.client.post(url, credentials) for _ in range(3)]
+
+        self.assertEqual(
+            [response.status_code for response in responses],
+            [
+                status.HTTP_200_OK,
+                status.HTTP_200_OK,
+                status.HTTP_429_TOO_MANY_REQUESTS,
+            ],
+        )
+
+    def test_rejections_are_counted_by_scope(self):
+        sample_user("user")
+        url = reverse("user:login")
+        credentials = {"email": "user@gmail.com", "password": "secret_password"}
+        rates = {**ScopedGCRAThrottle.THROTTLE_RATES, "login": "1/minute"}
+        rejections = (
+            REGISTRY.get_sample_value("throttle_rejections_total", {"scope": "login"})
+            or 0
+        )
+
+        with mock.patch.object(ScopedGCRAThrottle, "THROTTLE_RATES", rates), mock.patch(
+            "social_media_api.throttling._backend", SQLiteThrottleBackend(":memory:")
+        ):
+            for _ in range(3):
+                self.client.post(url, credentials)
+
+        self.assertEqual(
+            REGISTRY.get_sample_value("throttle_rejections_total", {"scope": "login"}),
+            rejections + 2,
+        )
+
+
+class LoginTests(APITestCase):
+    def setUp(self):
+        self.user = sample_user("user")
+        self.credentials = {"email": "user@gmail.com", "password": "secret_password"}
+
+    def test_token_login_skips_session(self):
+        response = self.client.post(reverse("user:login"), self.credentials)
+        self.user.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Session.objects.exists())
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_async_login(self):
+        response = self.client.post(reverse("user:login-async"), self.credentials)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json()["token"], Token.objects.get(user=self.user).key
+        )
+
+    def test_async_login_invalid_credentials(self):
+        response = self.client.post(
+            reverse("user:login-async"),
+            {"email": "user@gmail.com", "password": "invalid_password"},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["message"], "Incorrect Login credentials")
+
+    def test_login_rehashes_outdated_password(self):
+        self.user.password = PBKDF2PasswordHasher().encode(
+            "secret_password", "somesalt", iterations=1000
+        )
+        self.user.save()
+
+        self.client.post(reverse("user:login"), self.credentials)
+        self.user.refresh_from_db()
+
+        self.assertNotIn("$1000$", self.user.password)
+        self.assertTrue(self.user.check_password("secret_password"))
+
+    @override_settings(LOGIN_HASH_QUEUE_SIZE=0)
+    def test_login_rejected_when_hash_pool_is_full(self):
+        with mock.patch("user.hashing.hash_pool", PasswordHashPool()):
+            response = self.client.post(reverse("user:login"), self.credentials)
+            async_response = self.client.post(
+                reverse("user:login-async"), self.credentials
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(
+            async_response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+
+class AsyncUserApiTests(APITestCase):
+    def setUp(self):
+        self.user = sample_user("user")
+        self.other = sample_user("other")
+        self.user.following.add(self.other)
+        self.other.following.add(self.user)
+        self.client.force_authenticate(self.user)
+
+    def test_async_views_match_sync_views(self):
+        for sync_url, async_url in [
+            (USER_URL, reverse("user:async-user-list")),
+            (
+                detail_url(self.other.id),
+                reverse("user:async-user-detail", args=[self.other.id]),
+            ),
+            (reverse("user:followers"), reverse("user:async-followers")),
+            (reverse("user:following"), reverse("user:async-following")),
+        ]:
+            response = self.client.get(async_url)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json(), self.client.get(sync_url).json())
+
+
+class ProfilePictureTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(
+            MEDIA_ROOT=media_root, IMAGE_PROCESSING_WORKERS=0
+        )
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user = sample_user("user")
+        self.client.force_authenticate(self.user)
+
+    def test_profile_picture_variants(self):
+        buffer = BytesIO()
+        Image.new("RGB", (800, 800), "blue").save(buffer, "PNG")
+        picture = SimpleUploadedFile("me.png", buffer.getvalue(), "image/png")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(USER_MANAGE_URL, {"picture": picture}, format="multipart")
+
+        self.client.force_authenticate(sample_user("viewer"))
+        list_response = self.client.get(USER_URL)
+        detail_response = self.client.get(detail_url(self.user.id))
+
+        self.assertTrue(
+            list_response.data["results"][0]["picture"].endswith("-thumbnail.webp")
+        )
+        self.assertTrue(detail_response.data["picture"].endswith("-feed.webp"))
+        self.assertEqual(detail_response.data["picture_variants"]["full"]["width"], 800)
@@ -1,13 +1,21 @@
 from django.urls import path, include
 from rest_framework import routers
 
+from user.async_views import (
+    AsyncUserList,
+    AsyncUserDetail,
+    AsyncFollowersList,
+    AsyncFollowingList,
+)
 from user.views import (
     CreateUserView,
     ManageUserView,
     UserViewSet,
     LoginUserView,
+    AsyncLoginUserView,
     LogoutUserView,
     FollowUnfollow,
+    BulkFollow,
     MyFollowersList,
     MyFollowingList,
 )
@@ -19,10 +27,16 @@ urlpatterns = [
     path("register/", CreateUserView.as_view(), name="register"),
     path("me/", ManageUserView.as_view(), name="manage"),
     path("login/", LoginUserView.as_view(), name="login"),
+    path("login/async/", AsyncLoginUserView.as_view(), name="login-async"),
     path("logout/", LogoutUserView.as_view(), name="logout"),
     path("users/<int:pk>/follow", FollowUnfollow.as_view(), name="follow-unfollow"),
+    path("follow/", BulkFollow.as_view(), name="bulk-follow"),
     path("followers/", MyFollowersList.as_view(), name="followers"),
     path("following/", MyFollowingList.as_view(), name="following"),
+    path("async/users/", AsyncUserList.as_view(), name="async-user-list"),
+    path("async/users/<int:pk>/", AsyncUserDetail.as_view(), name="async-user-detail"),
+    path("async/followers/", AsyncFollowersList.as_view(), name="async-followers"),
+    path("async/following/", AsyncFollowingList.as_view(), name="async-following"),
     path("", include(route.urls)),
 ]
 
@@ -1,30 +1,52 @@
-from django.contrib.auth import get_user_model, login, logout
-from django.contrib.auth.hashers import check_password
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model, login, logout, user_logged_in
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter, extend_schema_view
-from rest_framework import generics, mixins, viewsets
+from rest_framework import generics, mixins, viewsets, status
+from rest_framework.authentication import SessionAuthentication
 from rest_framework.authtoken.models import Token
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import GenericAPIView
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
+from post.models import Post
+from social_media_api.batch import BatchRetrieveMixin
+from social_media_api.fieldsets import FIELDSET_PARAMETERS, Fieldset
+from social_media_api.timing import TimedViewMixin
+from user.hashing import HashPoolBusy, verify_password, averify_password
 from user.models import User
 from user.serializers import (
+    BulkFollowSerializer,
     LoginSerializer,
     UserSerializer,
     UserCreateSerializer,
     UserDetailSerializer,
     UserListSerializer,
+    USER_FIELD_COLUMNS,
 )
 
 
 @extend_schema_view(
     list=extend_schema(description="Display all users"),
     retrieve=extend_schema(description="Display user with specified id"),
+    batch=extend_schema(description="Display users with specified ids"),
 )
 class UserViewSet(
+    TimedViewMixin,
+    BatchRetrieveMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     viewsets.GenericViewSet,
@@ -32,6 +54,8 @@ class UserViewSet(
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
+    latest_posts = 3
+
     def get_queryset(self):
         queryset = self.queryset
 
@@ -39,10 +63,25 @@ class UserViewSet(
         if username:
             queryset = queryset.filter(username__icontains=username)
 
+        if self.action in ("list", "retrieve", "batch"):
+            fieldset = Fieldset(self.request, self.get_serializer_class())
+            queryset = queryset.only(*fieldset.columns(USER_FIELD_COLUMNS))
+            if "follow" in fieldset:
+                queryset = queryset.with_follow_info(self.request.user)
+            if "latest_posts" in fieldset:
+                posts = Post.objects.only("id", "title", "created_at", "author")
+                queryset = queryset.prefetch_related(
+                    Prefetch(
+                        "posts",
+                        queryset=posts[: self.latest_posts],
+                        to_attr="latest_posts",
+                    )
+                )
+
         return queryset.exclude(pk=self.request.user.pk)
 
     def get_serializer_class(self):
-        if self.action == "list":
+        if self.action in ("list", "batch"):
             return UserListSerializer
 
         if self.action == "retrieve":
@@ -57,17 +96,22 @@ class UserViewSet(
                 description="Filter users by username",
                 type=OpenApiTypes.STR,
                 required=False,
-            )
+            ),
+            *FIELDSET_PARAMETERS,
         ]
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    @extend_schema(parameters=FIELDSET_PARAMETERS)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
 @extend_schema(
     description="Register with email, username and password",
 )
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(TimedViewMixin, generics.CreateAPIView):
     serializer_class = UserCreateSerializer
     permission_classes = [AllowAny]
 
@@ -78,13 +122,35 @@ class CreateUserView(generics.CreateAPIView):
     patch=extend_schema(description="Update user profile"),
     delete=extend_schema(description="Delete user profile"),
 )
-class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
+class ManageUserView(TimedViewMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = UserSerializer
 
     def get_object(self):
         return self.request.user
 
 
+def log_in(request, account):
+    """
+    Log the account in, creating a session only when session authentication
+    is enabled
+    """
+    if any(
+        issubclass(authentication, SessionAuthentication)
+        for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    ):
+        login(request, account)
+    else:
+        user_logged_in.send(sender=account.__class__, request=request, user=account)
+
+
+def login_response_data(account, token):
+    return {
+        "message": "User Logged in successfully",
+        "email_address": account.email,
+        "token": token.key,
+    }
+
+
 @extend_schema_view(
     post=extend_schema(
         description="Login with email and password",
@@ -100,9 +166,10 @@ class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
         },
     )
 )
-class LoginUserView(GenericAPIView):
+class LoginUserView(TimedViewMixin, GenericAPIView):
     serializer_class = LoginSerializer
     permission_classes = [AllowAny]
+    throttle_scope = "login"
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -115,23 +182,93 @@ class LoginUserView(GenericAPIView):
         except get_user_model().DoesNotExist:
             raise ValidationError({"email": f"There is no user with email - {email}"})
 
-        if not check_password(password, account.password):
+        if not verify_password(account, password):
             raise ValidationError({"message": "Incorrect Login credentials"})
 
         if account.is_active:
-            login(request, account)
+            log_in(request, account)
             token, _ = Token.objects.get_or_create(user=account)
-            return Response(
-                {
-                    "message": "User Logged in successfully",
-                    "email_address": account.email,
-                    "token": token.key,
-                }
-            )
+            return Response(login_response_data(account, token))
         else:
             raise ValidationError({"non_field_errors": "Account not active"})
 
 
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncLoginUserView(View):
+    """
+    Native async variant of `LoginUserView` for ASGI servers, the password is
+    checked in the hash pool without occupying a worker thread.
+    """
+
+    throttle_scope = "login"
+
+    def get_throttles(self):
+        return [throttle() for throttle in api_settings.DEFAULT_THROTTLE_CLASSES]
+
+    def throttle_response(self, request):
+        for throttle in self.get_throttles():
+            if not throttle.allow_request(request, self):
+                response = JsonResponse(
+                    {"detail": "Request was throttled."},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS,
+                )
+                wait = throttle.wait()
+                if wait is not None:
+                    response["Retry-After"] = str(math.ceil(wait))
+                return response
+        return None
+
+    async def post(self, request):
+        response = await sync_to_async(self.throttle_response)(request)
+        if response is not None:
+            return response
+
+        if request.content_type == "application/json":
+            try:
+                data = json.loads(request.body)
+            except ValueError:
+                return JsonResponse(
+                    {"detail": "JSON parse error"}, status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            data = request.POST
+
+        serializer = LoginSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        email = serializer.validated_data["email"]
+        password = serializer.validated_data["password"]
+
+        try:
+            account = await get_user_model().objects.aget(email=email)
+        except get_user_model().DoesNotExist:
+            return JsonResponse(
+                {"email": f"There is no user with email - {email}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            is_correct = await averify_password(account, password)
+        except HashPoolBusy as error:
+            return JsonResponse({"detail": error.detail}, status=error.status_code)
+
+        if not is_correct:
+            return JsonResponse(
+                {"message": "Incorrect Login credentials"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not account.is_active:
+            return JsonResponse(
+                {"non_field_errors": "Account not active"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        await sync_to_async(log_in)(request, account)
+        token, _ = await Token.objects.aget_or_create(user=account)
+        return JsonResponse(login_response_data(account, token))
+
+
 @extend_schema_view(
     get=extend_schema(
         description="Logout and delete user token",
@@ -145,9 +282,9 @@ class LoginUserView(GenericAPIView):
         },
     )
 )
-class LogoutUserView(APIView):
+class LogoutUserView(TimedViewMixin, APIView):
     def get(self, request):
-        request.user.auth_token.delete()
+        Token.objects.filter(user=request.user).delete()
         logout(request)
 
         return Response({"message": "User Logged out successfully"})
@@ -166,20 +303,58 @@ class LogoutUserView(APIView):
         },
     )
 )
-class FollowUnfollow(APIView):
+class FollowUnfollow(TimedViewMixin, APIView):
     def post(self, request, pk, *args, **kwargs):
-        profile = User.objects.get(pk=pk)
+        profile = get_object_or_404(User.objects.only("id", "username"), pk=pk)
+
+        with transaction.atomic():
+            if request.user.unfollow(profile):
+                return Response(
+                    {"message": "You unfollowed user - " + profile.username}
+                )
+
+            request.user.follow(profile)
+            return Response({"message": "You followed user - " + profile.username})
+
+
+@extend_schema_view(
+    post=extend_schema(
+        description="Follow all users with specified ids",
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "message": {"type": "string"},
+                    "followed": {"type": "array", "items": {"type": "integer"}},
+                },
+            },
+        },
+    )
+)
+class BulkFollow(TimedViewMixin, GenericAPIView):
+    serializer_class = BulkFollowSerializer
 
-        if request.user in profile.followers.all():
-            profile.followers.remove(request.user)
-            return Response({"message": "You unfollowed user - " + profile.username})
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        profile.followers.add(request.user)
-        return Response({"message": "You followed user - " + profile.username})
+        profiles = (
+            User.objects.filter(pk__in=serializer.validated_data["ids"])
+            .exclude(pk=request.user.pk)
+            .only("id")
+        )
+        followed = request.user.follow(*profiles)
+
+        return Response(
+            {
+                "message": f"You followed {len(followed)} user(s)",
+                "followed": sorted(followed),
+            }
+        )
 
 
 @extend_schema(description="Display all user followers")
-class MyFollowersList(generics.ListAPIView):
+class MyFollowersList(TimedViewMixin, generics.ListAPIView):
     serializer_class = UserSerializer
 
     def get_queryset(self):
@@ -187,7 +362,7 @@ class MyFollowersList(generics.ListAPIView):
 
 
 @extend_schema(description="Display all user following")
-class MyFollowingList(generics.ListAPIView):
+class MyFollowingList(TimedViewMixin, generics.ListAPIView):
     serializer_class = UserSerializer
 
     def get_queryset(self):